@@ -1,14 +1,57 @@
 from datetime import datetime
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.db.session_windows import SessionLocal
+from app.db.session_windows import SessionLocal, AsyncSessionLocal
 import logging
 
 logger = logging.getLogger(__name__)
 
+INSERT_LOG_QUERY = """
+        INSERT INTO app_log (user_name, action, detail, created_at)
+        VALUES (:user_name, :action, :detail, :created_at)
+        """
+
 class BaseAdapter:
-    def __init__(self):
-        self.db: Session = SessionLocal()
+    def __init__(self, db: Session = None, async_db: AsyncSession = None):
+        """
+        :param db: Sesión de la solicitud (dependencia get_db); sin ella el adaptador abre la suya y la cierra con close()
+        :param async_db: Sesión asíncrona de la solicitud (dependencia get_async_db) para los métodos "a..."; sin ella se abre
+            una propia la primera vez que se usa y se cierra con aclose()
+        """
+        self._owns_session = db is None
+        self._owns_async_session = async_db is None
+        self.db: Session = db if db is not None else SessionLocal()
+        self._async_db: AsyncSession = async_db
+
+    @property
+    def async_db(self) -> AsyncSession:
+        # Los usos síncronos (with UserAdapter() en user_logic) nunca crean la sesión asíncrona
+        if self._async_db is None:
+            self._async_db = AsyncSessionLocal()
+        return self._async_db
+
+    def close(self):
+        if self._owns_session:
+            self.db.close()
+
+    async def aclose(self):
+        self.close()
+        if self._owns_async_session and self._async_db is not None:
+            await self._async_db.close()
+            self._async_db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
 
     def execute_query(self, query: str, params: tuple = ()):
         try:
@@ -40,13 +83,47 @@ class BaseAdapter:
             raise
 
     def insert_log(self, user_name: str, action: str, detail: str):
-        query = """
-        INSERT INTO app_log (user_name, action, detail, created_at)
-        VALUES (:user_name, :action, :detail, :created_at)
-        """
-        self.execute_query(query, {
+        self.execute_query(INSERT_LOG_QUERY, {
+            "user_name": user_name,
+            "action": action,
+            "detail": detail,
+            "created_at": datetime.now()
+        })
+
+    # Variantes asíncronas: misma lógica sobre la sesión asíncrona, sin ocupar un hilo mientras SQL Server responde
+    async def aexecute_query(self, query: str, params: tuple = ()):
+        try:
+            logger.info(f"→ Ejecutando (async): {query}")
+            logger.info(f"→ Con parámetros: {params}")
+            await self.async_db.execute(text(query), params)
+            await self.async_db.commit()
+        except Exception as e:
+            logger.error(f"❌ Error en aexecute_query: {e}")
+            await self.async_db.rollback()
+            raise
+
+    async def afetch_one(self, query: str, params: tuple = ()):
+        try:
+            logger.info(f"→ Ejecutando (async): {query}")
+            result = await self.async_db.execute(text(query), params)
+            return result.fetchone()
+        except Exception as e:
+            logger.error(f"❌ Error en afetch_one: {e}")
+            raise
+
+    async def afetch_all(self, query: str, params: tuple = ()):
+        try:
+            logger.info(f"→ Ejecutando (async): {query}")
+            result = await self.async_db.execute(text(query), params)
+            return result.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error en afetch_all: {e}")
+            raise
+
+    async def ainsert_log(self, user_name: str, action: str, detail: str):
+        await self.aexecute_query(INSERT_LOG_QUERY, {
             "user_name": user_name,
             "action": action,
             "detail": detail,
             "created_at": datetime.now()
-        })
\ No newline at end of file
+        })
@@ -7,8 +7,7 @@ from app.db.models import SecurityKeyRecordCreateModel, SecurityKeyRecord, Secur
 logger = logging.getLogger(__name__)
 
 class KeyAdapter:
-    def __init__(self):
-        self.connection = get_itds_connection()
+    # Cada operación toma una conexión del pool TDS y la devuelve al terminar (close)
 
     def get_latest_active_log(self) -> SecurityKeyRecord:
         query = """
@@ -16,8 +15,9 @@ class KeyAdapter:
         FROM CONECTINTEG.dbo.SecurityKeyRecords
         WHERE IsActive = 1
         """
+        connection = get_jtds_connection()
+        cursor = connection.cursor()
         try:
-            cursor = self.connection.cursor()
             cursor.execute(query)
             result = cursor.fetchone()
             
@@ -40,7 +40,7 @@ class KeyAdapter:
             raise HTTPException(status_code=500, detail="Internal server error.")
         finally:
             cursor.close()
-            self.connection.close()
+            connection.close()
 
     def get_public_key_file_log(self) -> SecurityKeyRecordFileModel:
         query = """
@@ -48,8 +48,9 @@ class KeyAdapter:
         FROM CONECTINTEG.dbo.SecurityKeyRecords
         WHERE IsActive = 1
         """
+        connection = get_jtds_connection()
+        cursor = connection.cursor()
         try:
-            cursor = self.connection.cursor()
             cursor.execute(query)
             result = cursor.fetchone()
             
@@ -72,7 +73,7 @@ class KeyAdapter:
             raise HTTPException(status_code=500, detail="Internal server error.")
         finally:
             cursor.close()
-            self.connection.close()
+            connection.close()
 
     def create_security_key_record(self, record: SecurityKeyRecordCreateModel) -> SecurityKeyRecordCreateModel:
         query = """
@@ -80,9 +81,9 @@ class KeyAdapter:
             PrivateKey, PublicKey, PrivateKeyFile, PublicKeyFile, IsActive, CreatedBy, CreationDate
         ) VALUES (%s, %s, CONVERT(varbinary(max), %s), CONVERT(varbinary(max), %s), %s, %s, %s)
         """
+        connection = get_jtds_connection()
+        cursor = connection.cursor()
         try:
-            connection = get_jtds_connection()
-            cursor = connection.cursor()
             
             # Convertir las fechas a cadenas si es necesario, o mantenerlas como datetime si se maneja adecuadamente.
             cursor.execute(query, (
@@ -100,7 +101,7 @@ class KeyAdapter:
             raise HTTPException(status_code=500, detail="Internal server error.")
         finally:
             cursor.close()
-            self.connection.close()
+            connection.close()
 
     def deseable_old_security_key_records(self, date: datetime, user: str):
         query = """
@@ -108,9 +109,9 @@ class KeyAdapter:
         SET IsActive = 0, ModificationDate = %s, ModifiedBy = %s
         WHERE IsActive = %s AND CreationDate < %s
         """
+        connection = get_jtds_connection()
+        cursor = connection.cursor()
         try:
-            connection = get_jtds_connection()
-            cursor = connection.cursor()
             
             date_str = date.strftime('%Y-%m-%d %H:%M:%S')
             
@@ -121,4 +122,4 @@ class KeyAdapter:
             raise HTTPException(status_code=500, detail="Internal server error.")
         finally:
             cursor.close()
-            self.connection.close()
\ No newline at end of file
+            connection.close()
\ No newline at end of file
@@ -159,16 +159,25 @@
 # CAMBIOS MÍNIMOS: Solo agregar función para validar empleados autorizados
 
 from app.adapter.db.base_adapter import BaseAdapter
+from app.utils.single_flight import directory_flight, flight_key
+from app.utils.directory_authenticator import directory_authenticator, DirectoryUnavailableError
 from datetime import datetime
-from ldap3 import Server, Connection, ALL, AUTO_BIND_NO_TLS, NONE
+from app.utils.ldap_pool import directory_pool, is_account_disabled, first_value, DirectoryPoolTimeout, DirectoryConfigurationError
+from app.auth.roles import role_resolver
+from app.auth.credential_cache import credential_cache
+from app.utils.directory_sync import directory_sync
+from app.utils.employee_index import match_by_email, match_by_name, DOMINIOS_BANISTMO
+from app.utils.employee_roster import employee_roster, EmployeeRosterUnavailableError
+from app.utils.name_similarity import EMPLOYEE_NAME_FUZZY_FALLBACK, EMPLOYEE_NAME_FUZZY_AUTH_SIMILARITY
+from ldap3.core.exceptions import LDAPException, LDAPCommunicationError
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
 class UserAdapter(BaseAdapter):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, db=None, async_db=None):
+        super().__init__(db, async_db)
 
     # ← NUEVO: Lista de empleados autorizados (misma del frontend)
     MOCK_EMPLEADOS = [
@@ -183,23 +192,24 @@ class UserAdapter(BaseAdapter):
     ]
 
     def validate_user_active_directory(self, username: str, password: str) -> bool:
-        ad_server = "bancolombia.corp"
-        ad_base_dn = "OU=Banistmo,OU=Usuarios,DC=bancolombia,DC=corp"
-        user_dn = f"{username}@bancolombia.corp"
-
+        # Logins simultáneos del mismo usuario (con la misma contraseña) comparten un solo bind
+        return directory_flight.do(
+            flight_key("adapter", username.lower(), password), self._validate_user_active_directory, username, password
+        )
+
+    async def avalidate_user_active_directory(self, username: str, password: str) -> bool:
+        # Variante para rutas async: el bind corre en el executor dedicado a AD, no en el threadpool compartido
+        return await directory_flight.do_async(
+            flight_key("adapter", username.lower(), password), directory_authenticator.run,
+            self._validate_user_active_directory, username, password
+        )
+
+    def _validate_user_active_directory(self, username: str, password: str) -> bool:
         try:
-            server = Server(ad_server, get_info=NONE)
-            print(server)
-            print("-----")
-            conn = Connection(server, user=user_dn, password=password, auto_bind=AUTO_BIND_NO_TLS, receive_timeout=5)
-            print(conn)
-            print("-----")
-            search_filter = f"(&(sAMAccountName={username})*"
-            print(search_filter)
-            print("-----")
-            conn.search(ad_base_dn, search_filter, attributes=['userAccountControl', 'displayName', 'mail'])
-            print(conn)
-            print("-----")
+            authenticated, entry = credential_cache.authenticate(username, password, role_resolver.attributes)
+            if not authenticated:
+                logger.warning(f"Credenciales inválidas para {username} en AD.")
+                return False
 
             """" Responde
             displayName: Juan Esteban Valencia
@@ -207,89 +217,111 @@ class UserAdapter(BaseAdapter):
             userAccountControl: 512
             """
 
-            if not conn.entries:
+            if not entry:
                 logger.warning(f"Usuario {username} no encontrado en AD.")
                 return False
 
-            entry = conn.entries[0]
-            user_account_control = int(entry.userAccountControl.value)
-            if user_account_control & 2:
+            if is_account_disabled(entry):
                 logger.warning(f"Usuario {username} está deshabilitado en AD.")
                 return False
 
-            logger.info(f"Usuario {username} válido en AD: {entry.displayName.value}, {entry.mail.value}")
+            logger.info(f"Usuario {username} válido en AD: {first_value(entry, 'displayName')}, {first_value(entry, 'mail')}")
+            role_resolver.remember(username, entry)  # El perfil del token sale de aquí sin otra consulta
             return True
 
+        except (LDAPCommunicationError, DirectoryPoolTimeout, DirectoryConfigurationError) as e:
+            # AD caído o sin configurar no es "credenciales inválidas": la ruta responde 503
+            logger.error(f"Active Directory no disponible al validar a {username}: {e}")
+            raise DirectoryUnavailableError(str(e)) from e
         except Exception as e:
             logger.error(f"Error al validar usuario {username} contra AD: {e}")
             return False
 
+    def user_exists_in_active_directory(self, username: str) -> bool:
+        """Existencia y estado de la cuenta en AD (sin contraseña), desde el índice local sincronizado si está disponible"""
+        status = self.validate_users_active_directory([username])[username]
+        if not status["exists"]:
+            logger.warning(f"Usuario {username} no encontrado en AD.")
+            return False
+        if not status["enabled"]:
+            logger.warning(f"Usuario {username} está deshabilitado en AD.")
+            return False
+        return True
+
+    def validate_users_active_directory(self, usernames: list) -> dict:
+        """
+        Existencia y estado en AD de varios usuarios en una sola pasada: índice local si está sincronizado, si no
+        búsquedas con filtro OR por bloques. Los usuarios que no están en el índice se buscan en AD, por si la cuenta se
+        creó después de la última sincronización.
+        :return: {username: {"exists": bool, "enabled": bool}}
+        :raises DirectoryUnavailableError: Si hay que consultar AD y no responde
+        """
+        result = {}
+        missing = usernames
+        if directory_sync.ready:
+            for username in usernames:
+                record = directory_sync.lookup(username)
+                if record is not None:
+                    result[username] = {"exists": True, "enabled": record.enabled}
+            missing = [username for username in usernames if username not in result]
+            if not missing:
+                return result
+
+        try:
+            entries = directory_pool.search_users(missing)
+        except (LDAPException, DirectoryPoolTimeout) as e:
+            # Sin respuesta del directorio (caído, sin cuenta de servicio o pool agotado) no se puede afirmar que las cuentas no
+            # existan: la ruta responde 503 en lugar de reportarlas como inexistentes
+            logger.error(f"Active Directory no disponible al buscar {len(missing)} usuarios: {e}")
+            raise DirectoryUnavailableError(str(e)) from e
+        for username in missing:
+            entry = entries.get(username.lower())
+            result[username] = {"exists": entry is not None, "enabled": entry is not None and not is_account_disabled(entry)}
+        return result
+
     # ← NUEVO: Validar si un usuario es empleado autorizado (misma lógica del frontend)
     def validate_employee_from_msal(self, user_email: str, user_name: str):
-        """Valida si un usuario de MSAL está en la lista de empleados autorizados"""
+        """
+        Valida si un usuario de MSAL está en la lista de empleados autorizados
+        :raises EmployeeRosterUnavailableError: Si la nómina configurada todavía no se ha cargado (no es "no autorizado")
+        """
         try:
             logger.info(f"🔍 Validando empleado: {user_email} - {user_name}")
             
-            # Buscar empleado que coincida
-            for empleado in self.MOCK_EMPLEADOS:
-                # Verificación por email corporativo
-                email_match = self._match_by_email(user_email, empleado)
-                # Verificación por nombre
-                name_match = self._match_by_name(user_name, empleado['nombre'])
-                
-                if email_match or name_match:
-                    logger.info(f"✅ Usuario autorizado: {empleado}")
+            # Búsqueda en el índice de la nómina vigente (mismo resultado que recorrerla en orden)
+            empleado = employee_roster.match(user_email, user_name)
+            if empleado is not None:
+                logger.info(f"✅ Usuario autorizado: {empleado}")
+                return empleado
+
+            # Respaldo (desactivado por defecto): nombre casi idéntico sin importar tildes ("Jose Pena" / "José Peña"), solo con
+            # correo corporativo y sin otro empleado con la misma similitud
+            es_banistmo = any(dominio in (user_email or "").lower() for dominio in DOMINIOS_BANISTMO)
+            if EMPLOYEE_NAME_FUZZY_FALLBACK and es_banistmo:
+                similares = employee_roster.search_name(user_name, k=2, threshold=EMPLOYEE_NAME_FUZZY_AUTH_SIMILARITY)
+                if len(similares) == 1 or (len(similares) == 2 and similares[0][0] > similares[1][0]):
+                    similitud, empleado = similares[0]
+                    logger.info(f"✅ Usuario autorizado por similitud de nombre ({similitud:.2f}): {empleado}")
                     return empleado
-            
+                if similares:
+                    logger.warning(f"⚠️ Similitud de nombre ambigua para {user_email}: {len(similares)} empleados empatados")
+
             logger.warning(f"❌ Usuario NO autorizado: {user_email}")
             return None
-            
+
+        except EmployeeRosterUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"❌ Error validando empleado: {e}")
             return None
 
     def _match_by_email(self, user_email: str, empleado: dict) -> bool:
         """Misma lógica que el frontend para verificar email"""
-        if not user_email:
-            return False
-        
-        email = user_email.lower()
-        dominios_banistmo = ['banistmo.com', 'banistmo.pa', 'banistmo.com.pa']
-        
-        # Verificar dominio
-        es_banistmo = any(dominio in email for dominio in dominios_banistmo)
-        if not es_banistmo:
-            return False
-        
-        # Verificar nombre en email
-        nombre_partes = empleado['nombre'].lower().split(' ')
-        nombre_partes = [parte for parte in nombre_partes if len(parte) > 2]
-        return any(parte in email for parte in nombre_partes)
+        return match_by_email(user_email, empleado['nombre'])
 
     def _match_by_name(self, user_name: str, empleado_nombre: str) -> bool:
         """Misma lógica que el frontend para verificar nombre"""
-        if not user_name or len(user_name) < 3:
-            return False
-        
-        user_name_clean = user_name.lower().strip()
-        empleado_name_clean = empleado_nombre.lower().strip()
-        
-        # Verificar coincidencia completa
-        if empleado_name_clean in user_name_clean or user_name_clean in empleado_name_clean:
-            return True
-        
-        # Verificar partes del nombre (requiere 2+ coincidencias)
-        user_parts = [part for part in user_name_clean.split(' ') if len(part) > 2]
-        empleado_parts = [part for part in empleado_name_clean.split(' ') if len(part) > 2]
-        
-        coincidencias = []
-        for user_part in user_parts:
-            for emp_part in empleado_parts:
-                if emp_part in user_part or user_part in emp_part:
-                    coincidencias.append(user_part)
-                    break
-        
-        return len(coincidencias) >= 2
+        return match_by_name(user_name, empleado_nombre)
 
     # ← Resto del código existente sin cambios...
     def user_exists(self, username: str):
@@ -299,27 +331,47 @@ class UserAdapter(BaseAdapter):
     def get_user_by_username(self, username: str):
         try:
             query = "EXEC dbo.sp_get_user_by_username :username"
-            result = self.fetch_one(query, {"username": username})
-            if result:
-                return {
-                    "user_name": result[0],
-                    "full_name": result[1],
-                    "email": result[2],
-                    "status": result[3],
-                    "created_at": result[4],
-                    "updated_at": result[5]
-                }
-            return None
+            return self._user_from_row(self.fetch_one(query, {"username": username}))
         except Exception as e:
             logger.error(f"❌ Error al consultar usuario {username} con SP: {e}")
             return None
 
+    @staticmethod
+    def _user_from_row(result):
+        if result:
+            return {
+                "user_name": result[0],
+                "full_name": result[1],
+                "email": result[2],
+                "status": result[3],
+                "created_at": result[4],
+                "updated_at": result[5]
+            }
+        return None
+
     def create_user(self, username: str, full_name: str, email: str, actor: str):
         logger.info(f"▶ create_user iniciado con: {username}, {full_name}, {email}")
 
-        if not self.validate_user_active_directory(username):
+        if not self.user_exists_in_active_directory(username):
             return "Usuario no válido en directorio activo"
 
+        return self._create_validated_user(username, full_name, email, actor)
+
+    def create_users(self, users: list, actor: str) -> dict:
+        """Crea varios usuarios validándolos contra AD en una sola pasada; devuelve el resultado por usuario"""
+        logger.info(f"▶ create_users iniciado con {len(users)} usuarios")
+        ad_status = self.validate_users_active_directory([user["username"] for user in users])
+
+        results = {}
+        for user in users:
+            status = ad_status[user["username"]]
+            if not status["exists"] or not status["enabled"]:
+                results[user["username"]] = "Usuario no válido en directorio activo"
+                continue
+            results[user["username"]] = self._create_validated_user(user["username"], user["full_name"], user["email"], actor)
+        return results
+
+    def _create_validated_user(self, username: str, full_name: str, email: str, actor: str):
         if self.user_exists(username):
             return "Usuario ya existe"
 
@@ -341,12 +393,7 @@ class UserAdapter(BaseAdapter):
 
     def update_user(self, username: str, actor: str, full_name: str = "", email: str = "", status: int = None, log_action: str = "Actualizar usuario", last_access: datetime = None):
         try:
-            json_data = json.dumps({
-                "actor": actor,
-                "detail": f"{log_action}: {username}",
-                "last_access": last_access.isoformat() if last_access else None
-            })
-
+            json_data = self._update_payload(username, actor, log_action, last_access)
             self.execute_query("EXEC dbo.sp_update_user :data", {"data": json_data})
         except Exception as e:
             logger.error(f"❌ Error actualizando usuario con SP JSON: {e}")
@@ -354,6 +401,14 @@ class UserAdapter(BaseAdapter):
 
         return "Usuario actualizado exitosamente"
 
+    @staticmethod
+    def _update_payload(username: str, actor: str, log_action: str, last_access: datetime) -> str:
+        return json.dumps({
+            "actor": actor,
+            "detail": f"{log_action}: {username}",
+            "last_access": last_access.isoformat() if last_access else None
+        })
+
     def get_user(self, username: str):
         user = self.user_exists(username)
         return user or "Usuario no encontrado"
@@ -376,5 +431,103 @@ class UserAdapter(BaseAdapter):
             return f"Error al asignar/desasignar rol: {e}"
 
         action = "Asignar rol" if asigno else "Desasignar rol"
-        self.insert_log(username, action)
+        self.insert_log(username, action, f"{action}: {username}")
+        return f"Rol {'asignado' if asigno else 'desasignado'} correctamente"
+
+    # Variantes asíncronas de las consultas con SP: mismas respuestas, sobre la sesión asíncrona. La validación en AD corre en el
+    # executor dedicado a AD.
+    async def auser_exists(self, username: str):
+        query = "EXEC dbo.sp_user_exists :username"
+        return await self.afetch_one(query, {"username": username})
+
+    async def aget_user_by_username(self, username: str):
+        try:
+            return await self.afind_user(username)
+        except Exception as e:
+            logger.error(f"❌ Error al consultar usuario {username} con SP: {e}")
+            return None
+
+    async def afind_user(self, username: str):
+        """Como aget_user_by_username, pero un error de base de datos se propaga en lugar de parecer un usuario inexistente"""
+        query = "EXEC dbo.sp_get_user_by_username :username"
+        return self._user_from_row(await self.afetch_one(query, {"username": username}))
+
+    async def acreate_user(self, username: str, full_name: str, email: str, actor: str):
+        logger.info(f"▶ acreate_user iniciado con: {username}, {full_name}, {email}")
+
+        if not await directory_authenticator.run(self.user_exists_in_active_directory, username):
+            return "Usuario no válido en directorio activo"
+
+        return await self._acreate_validated_user(username, full_name, email, actor)
+
+    async def acreate_users(self, users: list, actor: str) -> dict:
+        logger.info(f"▶ acreate_users iniciado con {len(users)} usuarios")
+        ad_status = await directory_authenticator.run(
+            self.validate_users_active_directory, [user["username"] for user in users]
+        )
+
+        results = {}
+        for user in users:
+            status = ad_status[user["username"]]
+            if not status["exists"] or not status["enabled"]:
+                results[user["username"]] = "Usuario no válido en directorio activo"
+                continue
+            results[user["username"]] = await self._acreate_validated_user(
+                user["username"], user["full_name"], user["email"], actor
+            )
+        return results
+
+    async def _acreate_validated_user(self, username: str, full_name: str, email: str, actor: str):
+        if await self.auser_exists(username):
+            return "Usuario ya existe"
+
+        try:
+            await self.aexecute_query("""
+                EXEC dbo.sp_create_user :username, :full_name, :email
+                """, {
+                    "username": username,
+                    "full_name": full_name,
+                    "email": email
+                })
+            logger.info("▶ Usuario insertado vía SP")
+        except Exception as e:
+            logger.error(f"❌ Error al insertar usuario con SP: {e}")
+            return f"Error al insertar usuario: {e}"
+
+        await self.ainsert_log(actor, "create", f"Crear usuario: {username}")
+        return "Usuario creado exitosamente"
+
+    async def aupdate_user(self, username: str, actor: str, full_name: str = "", email: str = "", status: int = None, log_action: str = "Actualizar usuario", last_access: datetime = None):
+        try:
+            json_data = self._update_payload(username, actor, log_action, last_access)
+            await self.aexecute_query("EXEC dbo.sp_update_user :data", {"data": json_data})
+        except Exception as e:
+            logger.error(f"❌ Error actualizando usuario con SP JSON: {e}")
+            return f"Error al actualizar: {e}"
+
+        return "Usuario actualizado exitosamente"
+
+    async def aget_user(self, username: str):
+        user = await self.auser_exists(username)
+        return user or "Usuario no encontrado"
+
+    async def aassign_role(self, rol_id: int, username: str, asigno: int):
+        user = await self.auser_exists(username)
+        if not user or user.status != 1:
+            return "Usuario no válido"
+
+        try:
+            await self.aexecute_query("""
+                EXEC dbo.sp_assign_role :rol_id, :username, :asigno
+                """, {
+                    "rol_id": rol_id,
+                    "username": username,
+                    "asigno": asigno
+                })
+        except Exception as e:
+            logger.error(f"❌ Error en assign_role con SP: {e}")
+            return f"Error al asignar/desasignar rol: {e}"
+
+        action = "Asignar rol" if asigno else "Desasignar rol"
+        await self.ainsert_log(username, action, f"{action}: {username}")
         return f"Rol {'asignado' if asigno else 'desasignado'} correctamente"
\ No newline at end of file
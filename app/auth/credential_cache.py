@@ -0,0 +1,194 @@
+# Este código evita repetir el bind contra Active Directory cuando un usuario vuelve a iniciar sesión a los pocos minutos (el token
+# interno dura 5 minutos). Tras un bind exitoso guarda en memoria un hash de la contraseña con sal aleatoria y scrypt (función
+# costosa en memoria, para que un volcado de memoria no permita probar contraseñas con rapidez) junto con los atributos del
+# usuario, durante una ventana corta configurable. Un nuevo login dentro de esa ventana se verifica localmente con ese hash. La
+# entrada se descarta al vencer la ventana, si el índice local del directorio (directory_sync) informa que la cuenta se deshabilitó
+# o que pwdLastSet cambió (cambio o reseteo de contraseña), o por invalidación explícita. Si la contraseña no coincide no se
+# rechaza localmente: se consulta a AD como siempre. Es opcional: con AD_CREDENTIAL_CACHE_SECONDS=0 (por defecto) no se usa.
+#
+# El índice local es la única fuente que detecta un cambio de contraseña sin el bind del usuario: sin él (sin cuenta de servicio o
+# antes de la primera carga) no se verifica ni se guarda nada localmente, y el cambio se detecta a más tardar en un intervalo de
+# sincronización (AD_SYNC_INTERVAL_SECONDS). El pwdLastSet de referencia se lee del directorio en el mismo bind, sin pasar por la
+# caché de atributos. Costo de scrypt por defecto (N=2048, r=8, 2 MB): unos 7 ms por hash, frente a decenas de ms de un bind;
+# con N=16384 eran ~55 ms y el hash del login costaba más que el bind que ahorra. Se mide con: python -m app.auth.credential_cache
+
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from app.utils.ldap_pool import directory_pool, is_account_disabled, first_value
+from app.utils.directory_sync import directory_sync
+
+logger = logging.getLogger(__name__)
+
+AD_CREDENTIAL_CACHE_SECONDS = int(os.getenv("AD_CREDENTIAL_CACHE_SECONDS", "0"))  # 0 = deshabilitado
+AD_CREDENTIAL_CACHE_MAX_SIZE = int(os.getenv("AD_CREDENTIAL_CACHE_MAX_SIZE", "5000"))
+AD_CREDENTIAL_SCRYPT_N = int(os.getenv("AD_CREDENTIAL_SCRYPT_N", "2048"))  # 2 MB por verificación con r=8
+AD_CREDENTIAL_SCRYPT_R = int(os.getenv("AD_CREDENTIAL_SCRYPT_R", "8"))
+AD_CREDENTIAL_SCRYPT_P = int(os.getenv("AD_CREDENTIAL_SCRYPT_P", "1"))
+
+PWD_LAST_SET = "pwdLastSet"
+
+
+class CachedCredential:
+    __slots__ = ("salt", "digest", "expires_at", "pwd_last_set", "entry")
+
+    def __init__(self, salt: bytes, digest: bytes, expires_at: float, pwd_last_set: str, entry: dict):
+        self.salt = salt
+        self.digest = digest
+        self.expires_at = expires_at
+        self.pwd_last_set = pwd_last_set
+        self.entry = entry
+
+
+class CredentialCache:
+    def __init__(self, window_seconds: int = AD_CREDENTIAL_CACHE_SECONDS, max_size: int = AD_CREDENTIAL_CACHE_MAX_SIZE,
+                 n: int = AD_CREDENTIAL_SCRYPT_N, r: int = AD_CREDENTIAL_SCRYPT_R, p: int = AD_CREDENTIAL_SCRYPT_P,
+                 directory=None, index=None):
+        """
+        :param directory: Pool de directorio para los binds (por defecto, el compartido)
+        :param index: Índice sincronizado para detectar cuentas deshabilitadas o contraseñas cambiadas
+        """
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self.n, self.r, self.p = n, r, p
+        self.directory = directory or directory_pool
+        self.index = index or directory_sync
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    @property
+    def usable(self) -> bool:
+        """Solo se verifica localmente si el índice puede detectar cuentas deshabilitadas o contraseñas cambiadas"""
+        return self.enabled and self.index.ready
+
+    def _hash(self, password: str, salt: bytes) -> bytes:
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=self.n, r=self.r, p=self.p,
+                              maxmem=256 * self.n * self.r * self.p, dklen=32)
+
+    def _is_stale(self, username: str, cached: CachedCredential) -> bool:
+        if cached.expires_at <= time.time():
+            return True
+        record = self.index.lookup(username)
+        return record is None or not record.enabled or record.pwd_last_set != cached.pwd_last_set
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def verify(self, username: str, password: str) -> dict:
+        """Atributos guardados si la contraseña coincide con la de un bind reciente; None si hay que ir a AD"""
+        if not self.index.ready:
+            self._count(hit=False)
+            return None
+        key = username.lower()
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is None:
+            self._count(hit=False)
+            return None
+
+        if self._is_stale(username, cached):
+            self.invalidate(username)
+            self._count(hit=False)
+            return None
+
+        matches = hmac.compare_digest(self._hash(password, cached.salt), cached.digest)
+        self._count(hit=matches)
+        return cached.entry if matches else None
+
+    def store(self, username: str, password: str, entry: dict):
+        salt = secrets.token_bytes(16)
+        cached = CachedCredential(
+            salt=salt,
+            digest=self._hash(password, salt),
+            expires_at=time.time() + self.window_seconds,
+            pwd_last_set=str(first_value(entry, PWD_LAST_SET)),
+            entry=entry,
+        )
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._purge_expired()
+            if len(self._entries) >= self.max_size:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[username.lower()] = cached
+
+    def _purge_expired(self):
+        # Recorre toda la caché: con la caché llena se hace a lo sumo una vez por minuto y entre tanto se desaloja la más antigua
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 60
+        for key in [k for k, c in self._entries.items() if c.expires_at <= now]:
+            del self._entries[key]
+
+    def invalidate(self, username: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(username.lower(), None) is not None
+            if removed:
+                self.invalidations += 1
+        return removed
+
+    def authenticate(self, username: str, password: str, attributes: list):
+        """
+        Igual que DirectoryPool.authenticate, pero un login repetido dentro de la ventana se verifica localmente.
+        :return: (autenticado, atributos)
+        """
+        if not self.usable or not username or not password:
+            return self.directory.authenticate(username, password, attributes)
+
+        entry = self.verify(username, password)
+        if entry is not None and all(name in entry for name in attributes):
+            logger.info(f"⚡ Credenciales de {username} verificadas localmente")
+            return True, entry
+
+        # pwdLastSet de referencia leído en este bind: el de la caché de atributos puede tener hasta AD_ATTRIBUTE_CACHE_TTL
+        authenticated, entry = self.directory.authenticate(username, password, attributes + [PWD_LAST_SET], fresh=True)
+        if authenticated and entry:
+            if is_account_disabled(entry):
+                self.invalidate(username)
+            else:
+                self.store(username, password, entry)
+        return authenticated, entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "usable": self.usable,
+                "window_seconds": self.window_seconds,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "scrypt": {"n": self.n, "r": self.r, "p": self.p},
+            }
+
+
+credential_cache = CredentialCache()
+
+
+if __name__ == "__main__":
+    # Costo de un hash con la configuración actual; debe quedar por debajo de la latencia de un bind (ver /api/v1/health/ldap)
+    samples = 20
+    start = time.perf_counter()
+    for _ in range(samples):
+        credential_cache._hash("Contraseña123", secrets.token_bytes(16))
+    elapsed_ms = (time.perf_counter() - start) * 1000 / samples
+    memory_mb = 128 * credential_cache.n * credential_cache.r / 1024 / 1024
+    print(f"scrypt N={credential_cache.n} r={credential_cache.r} p={credential_cache.p}: {elapsed_ms:.1f} ms por hash, "
+          f"{memory_mb:.0f} MB")
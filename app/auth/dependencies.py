@@ -2,17 +2,31 @@
 from fastapi import Depends, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordBearer
 from app.utils.token import verify_token
+from app.auth.revocation import revocation_list
+from app.auth.principal import Principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token") # Asegúrate que la ruta sea la correcta
 
-# ← MODIFICADO: Agregar Response para enviar token renovado
-def get_current_user(response: Response, token: str = Depends(oauth2_scheme)):
+def _get_verified_payload(token: str) -> dict:
     payload = verify_token(token)
-    if payload is None or "sub" not in payload:
+    if payload is None or "sub" not in payload or revocation_list.is_revoked(payload.get("jti")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
+
+# ← MODIFICADO: Agregar Response para enviar token renovado
+def get_current_user(response: Response, token: str = Depends(oauth2_scheme)):
+    payload = _get_verified_payload(token)
+    return payload["sub"]
+
+def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Identidad completa del usuario construida desde los claims verificados (sin consultar la base de datos)"""
+    return Principal.from_claims(_get_verified_payload(token))
 
-    return payload["sub"]
\ No newline at end of file
+def get_current_admin(principal: Principal = Depends(get_current_principal)):
+    if not principal.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Se requiere perfil administrador")
+    return principal.username
@@ -0,0 +1,156 @@
+# Este código valida localmente los tokens emitidos por Microsoft Entra ID (MSAL), sin llamar a Microsoft Graph en cada login.
+# Verifica la firma RS256 contra las llaves públicas del tenant (documento JWKS), además del emisor (iss), la audiencia (aud, el
+# client id de esta aplicación) y la expiración. El JWKS se guarda en memoria con las llaves ya construidas, se refresca en segundo
+# plano y, si llega un token firmado con un "kid" desconocido (Microsoft rotó sus llaves), se vuelve a descargar de inmediato,
+# con un intervalo mínimo entre descargas para que tokens con kid inventados no provoquen tráfico hacia Microsoft.
+# La URL del JWKS es configurable, de modo que en pruebas puede servirse desde un servidor local. Sin MSAL_TENANT_ID y MSAL_CLIENT_ID
+# la validación no está disponible: se registra un error al arrancar y la validación falla con MsalUnavailableError (la ruta
+# responde 503, no "token inválido"); lo mismo si no se puede descargar el JWKS de Microsoft.
+
+import logging
+import os
+import threading
+import time
+from jose import jwk, jwt, JWTError
+from app.utils.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+MSAL_TENANT_ID = os.getenv("MSAL_TENANT_ID")
+MSAL_CLIENT_ID = os.getenv("MSAL_CLIENT_ID")
+MSAL_JWKS_URL = os.getenv(
+    "MSAL_JWKS_URL", f"https://login.microsoftonline.com/{MSAL_TENANT_ID}/discovery/v2.0/keys" if MSAL_TENANT_ID else None
+)
+MSAL_ISSUER = os.getenv(
+    "MSAL_ISSUER", f"https://login.microsoftonline.com/{MSAL_TENANT_ID}/v2.0" if MSAL_TENANT_ID else None
+)
+MSAL_JWKS_REFRESH_SECONDS = int(os.getenv("MSAL_JWKS_REFRESH_SECONDS", "3600"))
+MSAL_JWKS_MIN_FETCH_SECONDS = int(os.getenv("MSAL_JWKS_MIN_FETCH_SECONDS", "60"))
+
+
+class MsalValidationError(Exception):
+    pass
+
+
+class MsalUnavailableError(MsalValidationError):
+    """La validación no se pudo hacer (sin configuración o sin JWKS): no dice nada del token"""
+    pass
+
+
+class JwksCache:
+    def __init__(self, jwks_url: str, refresh_seconds: int = MSAL_JWKS_REFRESH_SECONDS,
+                 min_fetch_seconds: int = MSAL_JWKS_MIN_FETCH_SECONDS):
+        self.jwks_url = jwks_url
+        self.refresh_seconds = refresh_seconds
+        self.min_fetch_seconds = min_fetch_seconds
+        self._keys = {}  # kid -> jose Key ya construida
+        self._last_fetch = 0.0
+        self._fetch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def fetch(self):
+        response = http_client.get(self.jwks_url, deadline=5)
+        response.raise_for_status()
+        keys = {}
+        for key_data in response.json().get("keys", []):
+            if key_data.get("kty") != "RSA" or "kid" not in key_data:
+                continue
+            keys[key_data["kid"]] = jwk.construct(key_data, key_data.get("alg", "RS256"))
+        self._keys = keys
+        self._last_fetch = time.time()
+        logger.info(f"🔑 JWKS de Microsoft actualizado: {len(keys)} llaves")
+
+    def get(self, kid: str):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        # kid desconocido: posible rotación de llaves, se descarga de nuevo (una sola vez por intervalo)
+        with self._fetch_lock:
+            key = self._keys.get(kid)
+            if key is None and time.time() - self._last_fetch >= self.min_fetch_seconds:
+                logger.info(f"🔄 kid desconocido {kid} - descargando JWKS")
+                self.fetch()
+                key = self._keys.get(kid)
+        return key
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                with self._fetch_lock:
+                    self.fetch()
+            except Exception as e:
+                logger.error(f"Error refrescando JWKS de Microsoft: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        try:
+            with self._fetch_lock:
+                self.fetch()
+        except Exception as e:
+            logger.error(f"Error descargando JWKS de Microsoft: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="msal-jwks-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+
+class MsalTokenValidator:
+    def __init__(self, client_id: str = MSAL_CLIENT_ID, issuer: str = MSAL_ISSUER, jwks_url: str = MSAL_JWKS_URL):
+        self.client_id = client_id
+        self.issuer = issuer
+        self.jwks = JwksCache(jwks_url) if jwks_url else None
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.client_id and self.issuer and self.jwks)
+
+    def validate(self, token: str) -> dict:
+        """Devuelve los claims del token si firma, emisor, audiencia y expiración son válidos"""
+        if not self.is_configured:
+            raise MsalUnavailableError("Validación MSAL no configurada (MSAL_TENANT_ID / MSAL_CLIENT_ID)")
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise MsalValidationError("Token MSAL malformado")
+
+        if header.get("alg") != "RS256":
+            raise MsalValidationError(f"Algoritmo no permitido: {header.get('alg')}")
+
+        try:
+            key = self.jwks.get(header.get("kid"))
+        except Exception as e:
+            raise MsalUnavailableError(f"No se pudo obtener el JWKS de Microsoft: {e}")
+        if key is None:
+            raise MsalValidationError(f"Llave de firma desconocida: {header.get('kid')}")
+
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.client_id,
+                issuer=self.issuer,
+                options={"verify_at_hash": False},
+            )
+        except JWTError as e:
+            raise MsalValidationError(f"Token MSAL inválido: {e}")
+
+    def start(self):
+        if self.is_configured:
+            self.jwks.start()
+        else:
+            logger.error("❌ Validación MSAL no configurada: defina MSAL_TENANT_ID y MSAL_CLIENT_ID (/validate-msal responderá 503)")
+
+    def stop(self):
+        if self.jwks is not None:
+            self.jwks.stop()
+
+
+msal_validator = MsalTokenValidator()
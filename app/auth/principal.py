@@ -0,0 +1,58 @@
+# Este código define el Principal: la identidad del usuario autenticado construida una sola vez por petición a partir de los claims
+# ya verificados del JWT. Guarda en atributos tipados (con __slots__, sin diccionario por instancia) el usuario, correo, nombre,
+# perfil e identificadores de empleado que se incluyeron al emitir el token, de modo que las rutas que necesitan esos datos no
+# tengan que volver a consultarlos en la base de datos con UserAdapter.get_user_by_username.
+
+from typing import Optional
+
+
+class Principal:
+    __slots__ = ("username", "email", "full_name", "perfil", "user_id", "employee_id", "employee_data", "jti",
+                 "expires_at", "claims")
+
+    def __init__(self, username: str, email: Optional[str] = None, full_name: Optional[str] = None,
+                 perfil: Optional[str] = None, user_id: Optional[str] = None, employee_id: Optional[int] = None,
+                 employee_data: Optional[dict] = None, jti: Optional[str] = None, expires_at: Optional[int] = None,
+                 claims: Optional[dict] = None):
+        self.username = username
+        self.email = email
+        self.full_name = full_name
+        self.perfil = perfil
+        self.user_id = user_id
+        self.employee_id = employee_id
+        self.employee_data = employee_data
+        self.jti = jti
+        self.expires_at = expires_at
+        self.claims = claims or {}
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "Principal":
+        return cls(
+            username=claims["sub"],
+            email=claims.get("email"),
+            full_name=claims.get("full_name"),
+            perfil=claims.get("perfil"),
+            user_id=claims.get("user_id"),
+            employee_id=claims.get("employee_id"),
+            employee_data=claims.get("employee_data"),
+            jti=claims.get("jti"),
+            expires_at=claims.get("exp"),
+            claims=claims,
+        )
+
+    @property
+    def is_admin(self) -> bool:
+        return self.perfil == "admin"
+
+    def to_dict(self) -> dict:
+        return {
+            "username": self.username,
+            "email": self.email,
+            "full_name": self.full_name,
+            "perfil": self.perfil,
+            "user_id": self.user_id,
+            "employee_id": self.employee_id,
+        }
+
+    def __repr__(self):
+        return f"Principal(username={self.username!r}, perfil={self.perfil!r})"
@@ -0,0 +1,184 @@
+# Este código implementa los refresh tokens con los que un cliente renueva su access token de 5 minutos sin volver a pasar por el
+# login completo (bind contra Active Directory, consulta del usuario en base de datos y actualización del último acceso).
+# Cada refresh token es un valor opaco y aleatorio del que solo se guarda su SHA-256. Al usarse se rota: se marca como usado y se
+# emite uno nuevo de la misma "familia" (sesión). Si un token ya usado vuelve a presentarse se asume que fue robado (detección de
+# reutilización) y se revoca la familia completa. La sesión es deslizante: cada renovación extiende la inactividad permitida, pero
+# nunca más allá de la duración máxima de la sesión. El id de la familia viaja como claim "sid" en los access tokens de la sesión,
+# para que al revocar un access token (/admin/revoke) se revoque también la sesión que podría seguir renovándolo.
+# La ruta /refresh vuelve a verificar al usuario (cuenta de AD, estado en base de datos o nómina de empleados) con peek(), sin
+# consumir el token, y solo después lo rota: si la verificación falla por un problema del directorio (503) el cliente puede
+# reintentar con el mismo token sin que cuente como reutilización. /logout revoca la familia del refresh token presentado.
+# Los registros viven en memoria y, opcionalmente, se replican en un backend persistente (RefreshTokenBackend) para sobrevivir
+# reinicios o compartirse entre procesos.
+
+import hashlib
+import logging
+import os
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_IDLE_MINUTES = int(os.getenv("REFRESH_TOKEN_IDLE_MINUTES", "60"))
+REFRESH_SESSION_MAX_HOURS = int(os.getenv("REFRESH_SESSION_MAX_HOURS", "12"))
+
+
+class RefreshTokenError(Exception):
+    pass
+
+
+class RefreshTokenReuseError(RefreshTokenError):
+    pass
+
+
+class RefreshRecord:
+    __slots__ = ("token_hash", "family_id", "claims", "expires_at", "session_expires_at", "used", "revoked")
+
+    def __init__(self, token_hash: str, family_id: str, claims: dict, expires_at: float, session_expires_at: float,
+                 used: bool = False, revoked: bool = False):
+        self.token_hash = token_hash
+        self.family_id = family_id
+        self.claims = claims
+        self.expires_at = expires_at
+        self.session_expires_at = session_expires_at
+        self.used = used
+        self.revoked = revoked
+
+
+class RefreshTokenBackend:
+    """Interfaz del almacenamiento persistente; la implementación por defecto no persiste nada"""
+
+    def save(self, record: RefreshRecord):
+        pass
+
+    def load(self, token_hash: str):
+        return None
+
+    def mark_used(self, token_hash: str):
+        pass
+
+    def revoke_family(self, family_id: str):
+        pass
+
+
+class RefreshTokenStore:
+    def __init__(self, backend: RefreshTokenBackend = None, idle_seconds: int = REFRESH_TOKEN_IDLE_MINUTES * 60,
+                 session_seconds: int = REFRESH_SESSION_MAX_HOURS * 3600):
+        self.backend = backend or RefreshTokenBackend()
+        self.idle_seconds = idle_seconds
+        self.session_seconds = session_seconds
+        self._records = {}  # token_hash -> RefreshRecord
+        self._families = {}  # family_id -> set(token_hash)
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _add(self, record: RefreshRecord):
+        self._records[record.token_hash] = record
+        self._families.setdefault(record.family_id, set()).add(record.token_hash)
+
+    def _new_record(self, claims: dict, family_id: str, session_expires_at: float, now: float):
+        token = secrets.token_urlsafe(32)
+        record = RefreshRecord(
+            token_hash=self._hash(token),
+            family_id=family_id,
+            claims=claims,
+            expires_at=min(now + self.idle_seconds, session_expires_at),
+            session_expires_at=session_expires_at,
+        )
+        self._add(record)
+        return token, record
+
+    def open_session(self, claims: dict):
+        """Emite el primer refresh token de una sesión nueva y devuelve (refresh_token, claims con "sid") para el access token"""
+        family_id = secrets.token_hex(16)
+        claims = {k: v for k, v in claims.items() if k not in ("exp", "iat", "nbf", "jti")}
+        claims["sid"] = family_id
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            token, record = self._new_record(claims, family_id, now + self.session_seconds, now)
+        self.backend.save(record)
+        return token, dict(claims)
+
+    def issue(self, claims: dict) -> str:
+        """Emite el primer refresh token de una sesión nueva"""
+        return self.open_session(claims)[0]
+
+    def _valid_record(self, token_hash: str, now: float) -> RefreshRecord:
+        """Registro vigente del token (con el lock tomado); un token ya usado revoca la familia"""
+        record = self._records.get(token_hash)
+        if record is None:
+            record = self.backend.load(token_hash)
+            if record is not None:
+                self._add(record)
+
+        if record is None or record.revoked:
+            raise RefreshTokenError("Refresh token inválido")
+
+        if record.used:
+            self._revoke_family(record.family_id)
+            logger.warning(f"🚨 Reutilización de refresh token detectada - sesión revocada para {record.claims.get('sub')}")
+            raise RefreshTokenReuseError("Refresh token reutilizado")
+
+        if record.expires_at <= now:
+            raise RefreshTokenError("Refresh token expirado")
+        return record
+
+    def peek(self, token: str) -> dict:
+        """Claims de un refresh token vigente sin consumirlo (para verificar al usuario antes de rotar)"""
+        with self._lock:
+            return dict(self._valid_record(self._hash(token), time.time()).claims)
+
+    def rotate(self, token: str):
+        """Consume un refresh token y devuelve (nuevo_refresh_token, claims) para emitir el access token"""
+        token_hash = self._hash(token)
+        now = time.time()
+        with self._lock:
+            record = self._valid_record(token_hash, now)
+            record.used = True
+            new_token, new_record = self._new_record(record.claims, record.family_id, record.session_expires_at, now)
+
+        self.backend.mark_used(token_hash)
+        self.backend.save(new_record)
+        return new_token, dict(record.claims)
+
+    def revoke(self, token: str):
+        """Revoca la sesión completa a la que pertenece el token (logout)"""
+        with self._lock:
+            record = self._records.get(self._hash(token))
+            if record is not None:
+                self._revoke_family(record.family_id)
+
+    def revoke_family(self, family_id: str) -> bool:
+        """Revoca la sesión con ese id (claim "sid" del access token). :return: True si había tokens de la sesión en memoria"""
+        with self._lock:
+            known = family_id in self._families
+            self._revoke_family(family_id)
+        return known
+
+    def _revoke_family(self, family_id: str):
+        for token_hash in self._families.get(family_id, ()):
+            self._records[token_hash].revoked = True
+        self.backend.revoke_family(family_id)
+
+    def _purge_expired(self, now: float):
+        # Los registros usados se conservan hasta su expiración para poder detectar reutilización
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 60
+        expired = [h for h, r in self._records.items() if r.expires_at <= now]
+        for token_hash in expired:
+            record = self._records.pop(token_hash)
+            family = self._families.get(record.family_id)
+            if family is not None:
+                family.discard(token_hash)
+                if not family:
+                    del self._families[record.family_id]
+
+
+refresh_token_store = RefreshTokenStore()
@@ -0,0 +1,154 @@
+# Este código implementa la lista de revocación de tokens JWT. Cada token emitido lleva un identificador único ("jti"); revocar
+# un token consiste en registrar su jti junto con su "exp", de modo que deje de aceptarse aunque su firma siga siendo válida.
+# Para no agregar una consulta a base de datos en cada petición protegida, la comprobación se hace en memoria en dos pasos:
+# primero un filtro de Bloom (si responde "no está", el token no está revocado y no se consulta nada más) y, solo si el filtro
+# responde "puede estar", se confirma contra el conjunto exacto. Las entradas se eliminan solas al llegar al exp del token (ya no
+# hace falta revocarlo) y el filtro se reconstruye con las que quedan. Las revocaciones se replican en un backend persistente
+# (RevocationBackend) y se recargan de forma incremental desde él en segundo plano, para compartirlas entre procesos.
+
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_RELOAD_SECONDS = int(os.getenv("REVOCATION_RELOAD_SECONDS", "30"))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationBackend:
+    """Interfaz del almacenamiento persistente; la implementación por defecto no persiste nada"""
+
+    def add(self, jti: str, expires_at: float):
+        pass
+
+    def load_since(self, watermark):
+        """Devuelve ([(jti, expires_at), ...], nuevo_watermark) con las revocaciones posteriores a watermark"""
+        return [], watermark
+
+
+class RevocationList:
+    def __init__(self, backend: RevocationBackend = None, capacity: int = REVOCATION_BLOOM_CAPACITY,
+                 error_rate: float = REVOCATION_BLOOM_ERROR_RATE, reload_seconds: int = REVOCATION_RELOAD_SECONDS):
+        self.backend = backend or RevocationBackend()
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.reload_seconds = reload_seconds
+        self._exact = {}  # jti -> expires_at
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._bloom_capacity = capacity  # Capacidad del filtro vigente; crece al reconstruirlo con más entradas
+        self._watermark = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.bloom_negatives = 0
+        self.false_positives = 0
+
+    def is_revoked(self, jti: str) -> bool:
+        if not jti or not self._exact:
+            return False
+        if jti not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+
+        expires_at = self._exact.get(jti)
+        if expires_at is None:
+            self.false_positives += 1
+            return False
+        return expires_at > time.time()
+
+    def revoke(self, jti: str, expires_at: float):
+        self._add(jti, expires_at)
+        self.backend.add(jti, expires_at)
+        logger.info(f"⛔ Token revocado: jti={jti} hasta {expires_at}")
+
+    def _add(self, jti: str, expires_at: float):
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._exact[jti] = expires_at
+            if len(self._exact) > self._bloom_capacity:
+                self._rebuild(time.time())
+            else:
+                self._bloom.add(jti)
+
+    def _rebuild(self, now: float):
+        """Elimina entradas expiradas y reconstruye el filtro (un filtro de Bloom no admite borrados)"""
+        self._exact = {jti: exp for jti, exp in self._exact.items() if exp > now}
+        capacity = max(self.capacity, len(self._exact) * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti in self._exact:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._bloom_capacity = capacity
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            if any(exp <= now for exp in self._exact.values()):
+                self._rebuild(now)
+
+    def reload(self):
+        """Trae del backend solo las revocaciones nuevas desde la última recarga"""
+        entries, watermark = self.backend.load_since(self._watermark)
+        for jti, expires_at in entries:
+            self._add(jti, expires_at)
+        self._watermark = watermark
+        if entries:
+            logger.info(f"🔄 {len(entries)} revocaciones cargadas desde el backend")
+
+    def _run(self):
+        while not self._stop.wait(self.reload_seconds):
+            try:
+                self.reload()
+                self.purge_expired()
+            except Exception as e:
+                logger.error(f"Error recargando la lista de revocación: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.reload()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="revocation-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._exact),
+            "bloom_capacity": self._bloom_capacity,
+            "bloom_negatives": self.bloom_negatives,
+            "false_positives": self.false_positives,
+        }
+
+
+revocation_list = RevocationList()
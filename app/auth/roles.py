@@ -0,0 +1,103 @@
+# Este código obtiene el perfil (rol) de un usuario a partir de sus grupos de Active Directory, en lugar de fijarlo en el código
+# ("admin" / "empleado"). Los grupos se leen del atributo construido tokenGroups, que AD calcula con toda la membresía transitiva
+# (grupos anidados incluidos) en una sola lectura, sin recorrer memberOf recursivamente. Cada SID de grupo se traduce a un rol con
+# la configuración AD_ROLE_MAP (JSON {"SID": "rol"}); si el usuario tiene varios roles se toma el de mayor prioridad según
+# AD_ROLE_PRIORITY. Los roles de cada usuario se guardan en memoria con un TTL, de modo que las siguientes emisiones de token (login
+# repetido, MSAL) no vuelven a consultar el directorio. Si no hay mapeo configurado se usa el perfil que cada ruta asignaba antes;
+# con mapeo configurado, un usuario sin grupos mapeados (o cuyos grupos no se pudieron leer) recibe el perfil de menor privilegio
+# AD_ROLE_DEFAULT, nunca el de la ruta. Solo se resuelven roles de sujetos ya autenticados: el login local /token, que no recibe
+# contraseña, conserva su perfil fijo.
+
+import json
+import logging
+import os
+from ldap3.core.exceptions import LDAPException
+from ldap3.protocol.formatters.formatters import format_sid
+from app.utils.ldap_pool import directory_pool, USER_ATTRIBUTES, TOKEN_GROUPS
+from app.utils.directory_sync import directory_sync
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+AD_ROLE_MAP = json.loads(os.getenv("AD_ROLE_MAP", "{}"))  # {"S-1-5-21-...-1234": "admin", ...}
+AD_ROLE_DEFAULT = os.getenv("AD_ROLE_DEFAULT", "empleado")  # Perfil sin grupos mapeados cuando hay AD_ROLE_MAP
+AD_ROLE_PRIORITY = [r.strip() for r in os.getenv("AD_ROLE_PRIORITY", "admin,empleado").split(",") if r.strip()]
+AD_ROLE_CACHE_TTL = int(os.getenv("AD_ROLE_CACHE_TTL", "900"))
+AD_ROLE_CACHE_MAX_SIZE = int(os.getenv("AD_ROLE_CACHE_MAX_SIZE", "10000"))
+
+ROLE_ATTRIBUTES = USER_ATTRIBUTES + [TOKEN_GROUPS]
+
+
+def sid_to_str(value) -> str:
+    # tokenGroups llega en binario (S-1-5-21-...); se acepta también un SID ya formateado como texto
+    if isinstance(value, (bytes, bytearray)):
+        return format_sid(bytes(value))
+    return str(value)
+
+
+class RoleResolver:
+    def __init__(self, role_map: dict = AD_ROLE_MAP, priority=AD_ROLE_PRIORITY, ttl: int = AD_ROLE_CACHE_TTL,
+                 max_size: int = AD_ROLE_CACHE_MAX_SIZE):
+        self.role_map = {sid.upper(): role for sid, role in role_map.items()}
+        self.priority = list(priority)
+        self._cache = TTLCache(max_size=max_size, default_ttl=ttl)
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.role_map)
+
+    @property
+    def attributes(self) -> list:
+        """Atributos a pedir en el login: tokenGroups solo si hay roles mapeados"""
+        return ROLE_ATTRIBUTES if self.is_configured else USER_ATTRIBUTES
+
+    def roles_from_groups(self, token_groups) -> list:
+        roles = {self.role_map.get(sid_to_str(sid).upper()) for sid in token_groups or []}
+        roles.discard(None)
+        rank = {role: i for i, role in enumerate(self.priority)}
+        return sorted(roles, key=lambda role: (rank.get(role, len(rank)), role))
+
+    def remember(self, username: str, entry: dict) -> list:
+        """Guarda los roles de un usuario a partir de una entrada de AD que incluye tokenGroups"""
+        if not entry or TOKEN_GROUPS not in entry:
+            return None
+        roles = self.roles_from_groups(entry[TOKEN_GROUPS])
+        self._cache.set(username.lower(), roles)
+        return roles
+
+    def resolve(self, username: str) -> list:
+        """Roles del usuario desde la caché o, si hay cuenta de servicio, con una lectura de tokenGroups"""
+        if not self.is_configured or not username:
+            return None
+        roles = self._cache.get(username.lower())
+        if roles is not None:
+            return roles
+        if not directory_pool.has_service_account:
+            return None
+        try:
+            return self.remember(username, directory_pool.search_user(username, ROLE_ATTRIBUTES))
+        except LDAPException as e:
+            logger.error(f"Error leyendo grupos de AD de {username}: {e}")
+            return None
+
+    def resolve_by_mail(self, mail: str) -> list:
+        # Usuarios MSAL: el correo se traduce a sAMAccountName con el índice local del directorio
+        record = directory_sync.lookup_mail(mail)
+        return self.resolve(record.username) if record is not None else None
+
+    def perfil(self, roles, default: str) -> str:
+        if roles:
+            return roles[0]
+        return AD_ROLE_DEFAULT if self.is_configured else default
+
+    def perfil_for_user(self, username: str, default: str) -> str:
+        return self.perfil(self.resolve(username), default)
+
+    def invalidate(self, username: str) -> bool:
+        return self._cache.delete(username.lower())
+
+    def stats(self) -> dict:
+        return {"configured": self.is_configured, "groups_mapped": len(self.role_map), **self._cache.stats()}
+
+
+role_resolver = RoleResolver()
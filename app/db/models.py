@@ -3,7 +3,7 @@
 # usuarios (creación, actualización, desactivación), todo con control de quién y cuándo se realizaron los cambios.
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 class KeyLog(BaseModel):
@@ -52,6 +52,9 @@ class UserCreate(BaseModel):
     full_name: str
     email: str
 
+class UsersBatchCreate(BaseModel):
+    users: List[UserCreate]
+
 class UserUpdate(BaseModel):
     username: str
     full_name: str
@@ -60,4 +63,13 @@ class UserUpdate(BaseModel):
 
 class UserDisable(BaseModel):
     username: str
-    status: int
\ No newline at end of file
+    status: int
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class RevokeTokenRequest(BaseModel):
+    token: Optional[str] = None
+    jti: Optional[str] = None
+    exp: Optional[int] = None
+    sid: Optional[str] = None  # Sesión de refresh a revocar junto con el token
\ No newline at end of file
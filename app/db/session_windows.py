@@ -2,13 +2,22 @@
 # para definir parámetros como el host, puerto, nombre de la base de datos, usuario y contraseña y tipo de autenticación (integrada o
 # con credenciales). Crea un motor de conexión (engine) y una fábrica de sesiones (SessionLocal) para ejecutar consultas. También incluye
 # funciones para validar la conexión (compatibilidad con código antiguo. Al ejecutarse directamente, intenta conectarse y muestra el
-# nombre de la base de datos si la conexión es exitosa.
+# nombre de la base de datos si la conexión es exitosa. get_jtds_connection y validate_connection usan el pool de conexiones nativas
+# TDS (tds_pool): la conexión entregada se devuelve al pool con close(). get_db es la dependencia de FastAPI que entrega a cada
+# solicitud su propia sesión, con una conexión del pool del engine (DB_POOL_SIZE + DB_MAX_OVERFLOW), y la cierra al terminar;
+# get_async_db hace lo mismo con el engine asíncrono (aioodbc) para las rutas async. aioodbc no es un driver asíncrono nativo:
+# ejecuta cada llamada de pyodbc en un hilo, así que una consulta en curso sigue ocupando un hilo aunque la ruta sea async. Para
+# que ese límite sea el pool y no el executor por defecto de asyncio (min(32, CPUs + 4) hilos, compartido con el resto del
+# proceso), el engine asíncrono usa un executor propio con DB_ASYNC_EXECUTOR_THREADS hilos, uno por conexión posible del pool.
 
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os
 import logging
 from urllib.parse import quote_plus
+from concurrent.futures import ThreadPoolExecutor
+from app.db.tds_pool import tds_pool
 
 logger = logging.getLogger(__name__)
 
@@ -22,39 +31,77 @@ DB_DRIVER = os.getenv("DB_DRIVER", "ODBC Driver 17 for SQL Server")
 # Escapar el driver
 escaped_driver = quote_plus(DB_DRIVER)
 USE_SSPI = os.getenv("USE_SSPI", "true").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))  # Conexiones que el engine mantiene abiertas
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))  # Conexiones adicionales en picos, se cierran al devolverse
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # Segundos de espera por una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Hilos para las llamadas de pyodbc del engine asíncrono (cada consulta en curso ocupa uno)
+DB_ASYNC_EXECUTOR_THREADS = int(os.getenv("DB_ASYNC_EXECUTOR_THREADS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+async_db_executor = ThreadPoolExecutor(max_workers=DB_ASYNC_EXECUTOR_THREADS, thread_name_prefix="aioodbc")
+
+def _connection_string(dialect: str) -> str:
+    # Misma conexión ODBC para el engine síncrono (pyodbc) y el asíncrono (aioodbc)
+    if USE_SSPI:
+        return f"{dialect}://@{DB_HOST}:{DB_PORT}/{DB_NAME}?driver={escaped_driver}&trusted_connection=yes"
+    return f"{dialect}://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?driver={escaped_driver}"
 
 # Crear el engine SQLAlchemy
 def get_sqlalchemy_engine():
     try:
-        if USE_SSPI:
-            connection_string = (
-                f"mssql+pyodbc://@{DB_HOST}:{DB_PORT}/{DB_NAME}?"
-                f"?driver={escaped_driver}&trusted_connection=yes"
-            )
-        else:
-            connection_string = (
-                f"mssql+pyodbc://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?"
-                f"?driver={escaped_driver}"
-            )
-
+        connection_string = _connection_string("mssql+pyodbc")
         logger.info(f"Creando engine con: {connection_string}")
-        engine = create_engine(connection_string, echo=False, future=True)
+        engine = create_engine(
+            connection_string, echo=False, future=True, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True
+        )
         return engine
     except Exception as e:
         logger.error(f"Error creando engine de SQLAlchemy: {e}")
         raise
 
+# Engine asíncrono: las rutas async esperan a SQL Server sin ocupar un hilo del threadpool
+def get_async_engine():
+    try:
+        connection_string = _connection_string("mssql+aioodbc")
+        logger.info(f"Creando engine asíncrono con: {connection_string}")
+        return create_async_engine(
+            connection_string, echo=False, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True,
+            connect_args={"executor": async_db_executor}
+        )
+    except Exception as e:
+        logger.error(f"Error creando engine asíncrono de SQLAlchemy: {e}")
+        raise
+
 # Crear session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_sqlalchemy_engine())
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=get_async_engine())
+
+def get_db():
+    """Dependencia de FastAPI: una sesión por solicitud, que devuelve su conexión al pool al terminar"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Dependencia de FastAPI: una sesión asíncrona por solicitud, cerrada al terminar"""
+    async with AsyncSessionLocal() as db:
+        yield db
 
 def get_jtds_connection():
-    """Compatibilidad con código antiguo que espera esta función."""
-    return SessionLocal().connection()
+    """Compatibilidad con código antiguo que espera esta función: conexión DB-API del pool TDS (close() la devuelve)."""
+    return tds_pool.connection()
 
 def validate_connection():
     try:
-        with SessionLocal() as session:
-            result = session.execute(text("SELECT 1")).scalar()
+        with get_jtds_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            result = cursor.fetchone()[0]
+            cursor.close()
             return f"Conexión exitosa. Resultado: {result}"
     except Exception as e:
         return f"Error de conexión: {e}"
@@ -0,0 +1,281 @@
+# Este código mantiene un pool de conexiones nativas TDS (python-tds) hacia SQL Server para las consultas que usan la API de
+# get_jtds_connection (KeyAdapter y el health check), en lugar de abrir una conexión nueva por JDBC (jaydebeapi + JTDS, con una
+# JVM embebida) en cada llamada. El pool abre min_size conexiones al arrancar y crece hasta max_size; si no hay conexiones libres
+# la solicitud espera hasta checkout_timeout y luego falla. Antes de entregar una conexión la verifica con un SELECT 1 (pre-ping)
+# y descarta las que superan recycle_seconds de vida, para no usar conexiones cortadas por el servidor o un firewall. La conexión
+# entregada es un envoltorio con la misma interfaz DB-API (cursor, commit, rollback): close() no cierra el socket, hace rollback
+# de lo no confirmado y la devuelve al pool. Se registran los tiempos de espera para obtener una conexión. checkout_timeout acota
+# también la apertura de una conexión nueva: el login recibe como timeout lo que queda del plazo. El pool lleva la cuenta de las
+# conexiones prestadas, y close() (al apagar la aplicación) cierra también esas, no solo las libres.
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+import pytds
+
+logger = logging.getLogger(__name__)
+
+DB_HOST = os.getenv("DB_HOST", "STMDEBDGHM@3V")
+DB_PORT = int(os.getenv("DB_PORT", "57856"))
+DB_NAME = os.getenv("DB_NAME", "CONECTINTEG")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASS")
+USE_SSPI = os.getenv("USE_SSPI", "true").lower() == "true"
+DB_TDS_POOL_MIN_SIZE = int(os.getenv("DB_TDS_POOL_MIN_SIZE", "1"))
+DB_TDS_POOL_MAX_SIZE = int(os.getenv("DB_TDS_POOL_MAX_SIZE", "10"))
+DB_TDS_POOL_RECYCLE_SECONDS = int(os.getenv("DB_TDS_POOL_RECYCLE_SECONDS", "1800"))
+DB_TDS_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_TDS_POOL_CHECKOUT_TIMEOUT", "5"))
+DB_TDS_POOL_PRE_PING = os.getenv("DB_TDS_POOL_PRE_PING", "true").lower() == "true"
+DB_TDS_LOGIN_TIMEOUT = float(os.getenv("DB_TDS_LOGIN_TIMEOUT", "10"))
+DB_TDS_QUERY_TIMEOUT = float(os.getenv("DB_TDS_QUERY_TIMEOUT", "30"))
+
+
+class DatabasePoolTimeout(Exception):
+    pass
+
+
+def connect_tds(login_timeout: float = DB_TDS_LOGIN_TIMEOUT):
+    """Conexión nueva a SQL Server; con USE_SSPI usa la autenticación integrada de Windows"""
+    return pytds.connect(
+        server=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+        user=None if USE_SSPI else DB_USER,
+        password=None if USE_SSPI else DB_PASS,
+        use_sso=USE_SSPI,
+        login_timeout=login_timeout,
+        timeout=DB_TDS_QUERY_TIMEOUT,
+        autocommit=False,
+    )
+
+
+class PooledTdsEntry:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledTdsConnection:
+    """Conexión prestada por el pool: misma interfaz DB-API, pero close() la devuelve al pool"""
+
+    def __init__(self, pool, entry: PooledTdsEntry):
+        self._pool = pool
+        self._entry = entry
+
+    def cursor(self):
+        return self._connection().cursor()
+
+    def commit(self):
+        self._connection().commit()
+
+    def rollback(self):
+        self._connection().rollback()
+
+    def _connection(self):
+        if self._entry is None:
+            raise pytds.InterfaceError("La conexión ya fue devuelta al pool")
+        return self._entry.conn
+
+    @property
+    def closed(self) -> bool:
+        return self._entry is None
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TdsConnectionPool:
+    def __init__(self, factory=connect_tds, min_size: int = DB_TDS_POOL_MIN_SIZE, max_size: int = DB_TDS_POOL_MAX_SIZE,
+                 recycle_seconds: int = DB_TDS_POOL_RECYCLE_SECONDS,
+                 checkout_timeout: float = DB_TDS_POOL_CHECKOUT_TIMEOUT, pre_ping: bool = DB_TDS_POOL_PRE_PING):
+        self.factory = factory
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.recycle_seconds = recycle_seconds
+        self.checkout_timeout = checkout_timeout
+        self.pre_ping = pre_ping
+        self._idle = deque()
+        self._in_use = set()  # Entradas prestadas, para cerrarlas al apagar
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._waits_ms = deque(maxlen=1024)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+
+    def warm(self) -> int:
+        """Abre conexiones hasta min_size. :return: conexiones abiertas"""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return opened
+                self._size += 1
+            try:
+                entry = PooledTdsEntry(self.factory())
+            except Exception as e:
+                with self._cond:
+                    self._size -= 1
+                logger.error(f"Error abriendo conexiones iniciales del pool TDS: {e}")
+                return opened
+            with self._cond:
+                self.created += 1
+                self._idle.append(entry)
+                self._cond.notify()
+            opened += 1
+
+    def _close(self, entry: PooledTdsEntry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, entry: PooledTdsEntry, now: float) -> bool:
+        return now - entry.created_at > self.recycle_seconds
+
+    def _ping(self, entry: PooledTdsEntry) -> bool:
+        try:
+            cursor = entry.conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión TDS descartada tras pre-ping fallido: {e}")
+            return False
+
+    def _discard(self, entry: PooledTdsEntry):
+        self._close(entry)
+        with self._cond:
+            self._in_use.discard(entry)
+            self._size -= 1
+            self.discarded += 1
+            self._cond.notify()
+
+    def connection(self) -> PooledTdsConnection:
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise pytds.InterfaceError("El pool TDS está cerrado")
+                    now = time.monotonic()
+                    if self._idle:
+                        entry = self._idle.pop()  # LIFO: la conexión usada más recientemente
+                        break
+                    if now >= deadline:
+                        # También cuando el plazo se consumió descartando conexiones tras el pre-ping
+                        self.timeouts += 1
+                        raise DatabasePoolTimeout(f"Pool TDS agotado ({self._size}/{self.max_size} conexiones) tras "
+                                                  f"{self.checkout_timeout} s")
+                    if self._size < self.max_size:
+                        self._size += 1
+                        entry = None
+                        break
+                    self._cond.wait(deadline - now)
+
+            if entry is None:
+                # El login no puede pasarse del plazo de checkout (DB_TDS_LOGIN_TIMEOUT es solo el máximo)
+                login_timeout = min(DB_TDS_LOGIN_TIMEOUT, deadline - time.monotonic())
+                try:
+                    entry = PooledTdsEntry(self.factory(login_timeout=login_timeout))
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.created += 1
+                break
+
+            if self._expired(entry, time.monotonic()) or (self.pre_ping and not self._ping(entry)):
+                self._discard(entry)
+                continue
+            break
+
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self._in_use.add(entry)
+            self.checkouts += 1
+            self._waits_ms.append(wait_ms)
+        return PooledTdsConnection(self, entry)
+
+    def _release(self, entry: PooledTdsEntry):
+        with self._cond:
+            self._in_use.discard(entry)
+            closed = self._closed
+        if closed:
+            # close() ya la cerró (o la cierra ahora si se prestó durante el apagado)
+            self._close(entry)
+            return
+        # Lo no confirmado no debe pasar al siguiente usuario de la conexión
+        try:
+            entry.conn.rollback()
+        except Exception as e:
+            logger.warning(f"Conexión TDS descartada al devolverla al pool: {e}")
+            self._discard(entry)
+            return
+        entry.last_used = time.monotonic()
+        if self._expired(entry, entry.last_used):
+            self._discard(entry)
+            return
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close(self):
+        """Cierra las conexiones libres y las prestadas; las prestadas fallan en su siguiente uso"""
+        with self._cond:
+            self._closed = True
+            entries = list(self._idle) + list(self._in_use)
+            self._idle.clear()
+            self._in_use.clear()
+            self._size -= len(entries)
+            self._cond.notify_all()
+        for entry in entries:
+            self._close(entry)
+        if entries:
+            logger.info(f"🔌 Pool TDS cerrado: {len(entries)} conexiones")
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits_ms)
+            counters = {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "discarded": self.discarded,
+            }
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 2) if waits else 0.0
+
+        counters["checkout_wait_ms"] = {"p50": percentile(0.50), "p95": percentile(0.95), "max": percentile(1.0)}
+        return counters
+
+
+tds_pool = TdsConnectionPool()
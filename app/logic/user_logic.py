@@ -3,37 +3,43 @@
 # manejo de errores mediante bloques try-except que registran cualquier fallo. Además, incluye una función de inicio de sesión (login)
 # que simula la autenticación de un usuario y genera un token (tipo bearer) usando información básica del usuario, lo cual
 # es útil para controlar el acceso a recursos protegidos dentro de la aplicación. En conjunto, el código proporciona una interfaz
-# sencilla para operaciones comunes de administración de usuarios.
+# sencilla para operaciones comunes de administración de usuarios. Cada operación usa su propio adaptador (y su propia sesión de base de
+# datos), que se cierra al terminar.
 
-from app.adapters.user_adapter import UserAdapter
+from app.adapter.db.user_adapter import UserAdapter
 from app.utils.token import create_access_token
+import logging
 
-adapter = UserAdapter()
+logger = logging.getLogger(__name__)
 
 def create(user: str, rol: str = None):
     try:
-        return adapter.create_user(user)
+        with UserAdapter() as adapter:
+            return adapter.create_user(user)
     except Exception as e:
         logger.error(f"Error crear usuario: {e}")
         return 'Error'
 
 def modify(user: str, full_name: str, email: str, status: int):
     try:
-        return adapter.update_user(user, full_name, email, status)
+        with UserAdapter() as adapter:
+            return adapter.update_user(user, full_name, email, status)
     except Exception as e:
         logger.error(f"Error modificar usuario: {e}")
         return 'Error'
 
 def consult(user: str):
     try:
-        return adapter.get_user(user)
+        with UserAdapter() as adapter:
+            return adapter.get_user(user)
     except Exception as e:
         logger.error(f"Error consultar usuario: {e}")
         return 'Error'
 
 def manage_role(rol_id: int, username: str, asigno: int):
     try:
-        return adapter.assign_role(rol_id, username, asigno)
+        with UserAdapter() as adapter:
+            return adapter.assign_role(rol_id, username, asigno)
     except Exception as e:
         logger.error(f"Error manejando rol: {e}")
         return 'Error'
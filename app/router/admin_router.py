@@ -0,0 +1,75 @@
+# Este código define los endpoints de administración de tokens. La ruta /revoke permite a un usuario con perfil "admin" revocar
+# un JWT emitido, ya sea enviando el token completo (del que se extraen su jti, su exp y su sid) o directamente su jti y exp (y
+# opcionalmente su sid). Una vez revocado, el token deja de aceptarse en las rutas protegidas aunque su firma y su expiración sigan
+# siendo válidas, y la sesión de refresh indicada por su sid se revoca para que no pueda emitir access tokens nuevos. La ruta
+# /revocations/stats expone los contadores de la lista de revocación. Las rutas /directory-cache invalidan los atributos de Active
+# Directory cacheados de un usuario (o todos), incluidos sus roles y su credencial verificada localmente, para que un cambio en
+# AD se refleje sin esperar al TTL. La ruta /employee-roster/reload recarga de inmediato la nómina de empleados autorizados.
+
+from fastapi import APIRouter, HTTPException, Depends
+from app.auth.dependencies import get_current_admin
+from app.auth.revocation import revocation_list
+from app.auth.refresh_tokens import refresh_token_store
+from app.db.models import RevokeTokenRequest
+from app.utils.token import verify_token
+from app.utils.ldap_pool import invalidate_directory_user, clear_directory_caches
+from app.auth.roles import role_resolver
+from app.auth.credential_cache import credential_cache
+from app.utils.employee_roster import employee_roster
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.post("/revoke")
+def revoke_token(request: RevokeTokenRequest, current_admin: str = Depends(get_current_admin)):
+    """Revoca un token por su valor o por su jti/exp"""
+    if request.token:
+        payload = verify_token(request.token)
+        if payload is None:
+            raise HTTPException(status_code=400, detail="Token inválido o expirado, no requiere revocación")
+        jti, exp, sid = payload.get("jti"), payload.get("exp"), payload.get("sid")
+    else:
+        jti, exp, sid = request.jti, request.exp, request.sid
+
+    if not jti or not exp:
+        raise HTTPException(status_code=400, detail="Se requiere el token o su jti y exp")
+
+    revocation_list.revoke(jti, exp)
+    if sid:
+        refresh_token_store.revoke_family(sid)
+    logger.info(f"Token {jti} revocado por {current_admin}" + (f" junto con la sesión {sid}" if sid else ""))
+    return {"message": "Token revocado", "jti": jti, "session_revoked": bool(sid)}
+
+@router.get("/revocations/stats")
+def revocation_stats(current_admin: str = Depends(get_current_admin)):
+    """Contadores de la lista de revocación"""
+    return revocation_list.stats()
+
+@router.delete("/directory-cache/{username}")
+def invalidate_directory_cache(username: str, current_admin: str = Depends(get_current_admin)):
+    """Elimina de la caché los atributos de AD de un usuario"""
+    removed = invalidate_directory_user(username)
+    removed = role_resolver.invalidate(username) or removed
+    removed = credential_cache.invalidate(username) or removed
+    return {"message": "Caché de directorio invalidada" if removed else "Usuario no estaba en caché", "username": username}
+
+@router.delete("/directory-cache")
+def clear_directory_cache(current_admin: str = Depends(get_current_admin)):
+    """Vacía la caché de atributos de AD"""
+    clear_directory_caches()
+    return {"message": "Caché de directorio vaciada"}
+
+@router.post("/employee-roster/reload")
+def reload_employee_roster(current_admin: str = Depends(get_current_admin)):
+    """Recarga la nómina de empleados autorizados sin esperar a la siguiente revisión"""
+    if not employee_roster.is_configured:
+        raise HTTPException(status_code=400, detail="No hay fuente de nómina configurada (EMPLOYEE_ROSTER_SOURCE)")
+    try:
+        employee_roster.reload(force=True)
+    except Exception as e:
+        logger.error(f"Error recargando la nómina: {e}")
+        raise HTTPException(status_code=500, detail=f"Error recargando la nómina: {e}")
+    logger.info(f"Nómina recargada por {current_admin}")
+    return {"message": "Nómina recargada", **employee_roster.stats()}
@@ -1,10 +1,23 @@
 # Este código en FastAPI define un endpoint POST en la ruta /db que sirve para verificar si la conexión a la base de datos está
 # funcionando correctamente; al recibir una solicitud, ejecuta la función db_checker() (que realiza la validación), registra el
 # proceso en los logs, y devuelve un mensaje con el resultado si todo sale bien, o lanza una excepción HTTP 500 con el detalle
-# del error si ocurre algún problema durante la verificación.
+# del error si ocurre algún problema durante la verificación. La ruta GET /http expone las estadísticas del cliente HTTP compartido
+# (latencias y reutilización de conexiones del pool), GET /single-flight las validaciones de identidad coalescidas y GET /ldap
+# el estado de los pools de conexiones a Active Directory con sus latencias de bind y búsqueda, junto con el tiempo en cola y de
+# ejecución de las validaciones en el executor dedicado a AD, el estado de la sincronización local del directorio y los logins
+# verificados localmente. GET /employee-roster muestra la fuente, versión y tamaño de la nómina de empleados vigente y GET /tds el
+# estado del pool de conexiones TDS a SQL Server, con los tiempos de espera para obtener una conexión.
 
 from fastapi import APIRouter, HTTPException
 from app.logic.db_health_checker_logic import db_checker
+from app.utils.http_client import http_client
+from app.utils.single_flight import single_flight_stats
+from app.utils.ldap_pool import directory_pool
+from app.utils.directory_authenticator import directory_authenticator
+from app.utils.directory_sync import directory_sync
+from app.auth.credential_cache import credential_cache
+from app.utils.employee_roster import employee_roster
+from app.db.tds_pool import tds_pool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,4 +34,30 @@ def health_checker_db():
         return {"message": result}
     except Exception as e:
         logger.error(f"Health check process failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/http")
+def health_checker_http():
+    """Estadísticas del pool de conexiones HTTP salientes"""
+    return http_client.stats()
+
+@router.get("/single-flight")
+def health_checker_single_flight():
+    """Validaciones de identidad ejecutadas frente a coalescidas"""
+    return single_flight_stats()
+
+@router.get("/ldap")
+def health_checker_ldap():
+    """Estado de los pools LDAP, latencias de bind y búsqueda, cola de validaciones y sincronización"""
+    return {**directory_pool.stats(), "authenticator": directory_authenticator.stats(), "sync": directory_sync.stats(),
+            "credential_cache": credential_cache.stats()}
+
+@router.get("/employee-roster")
+def health_checker_employee_roster():
+    """Fuente, versión y tamaño de la nómina de empleados autorizados"""
+    return employee_roster.stats()
+
+@router.get("/tds")
+def health_checker_tds():
+    """Estado del pool de conexiones TDS y tiempos de espera para obtener una conexión"""
+    return tds_pool.stats()
@@ -0,0 +1,25 @@
+# Este código publica el documento JWKS (JSON Web Key Set) con las llaves públicas usadas para firmar los JWT internos, en la ruta
+# /.well-known/jwks.json. El documento se sirve directamente desde memoria y con encabezados de caché largos, de modo que los
+# servidores de recursos puedan verificar los tokens localmente sin consultar a este backend en cada petición. Si la aplicación
+# firma con HS256 (secreto compartido) no hay llaves públicas que publicar y se responde con un conjunto vacío. El llavero no activa
+# una llave hasta que lleva publicada al menos el tiempo de esta caché (JWKS_CACHE_SECONDS, definido en app/utils/jwt_keys.py).
+
+from fastapi import APIRouter, Request, Response
+from app.utils.token import key_ring
+from app.utils.jwt_keys import JWKS_CACHE_SECONDS, JWKS_STALE_SECONDS
+import hashlib
+
+router = APIRouter()
+
+@router.get("/jwks.json")
+def get_jwks(request: Request):
+    """Llaves públicas para verificar los JWT emitidos"""
+    body = key_ring.jwks_json() if key_ring is not None else b'{"keys":[]}'
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {
+        "Cache-Control": f"public, max-age={JWKS_CACHE_SECONDS}, stale-while-revalidate={JWKS_STALE_SECONDS}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
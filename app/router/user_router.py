@@ -139,16 +139,31 @@
 
 from fastapi import APIRouter, Header, HTTPException, Depends
 from fastapi.security import OAuth2PasswordRequestForm
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_user, get_current_principal
+from app.auth.principal import Principal
 from app.adapter.db.user_adapter import UserAdapter
-from app.db.models import UserLookup, UserCreate, UserUpdate, UserDisable
-from app.utils.token import create_access_token
+from app.db.session_windows import get_db, get_async_db
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from app.db.models import UserLookup, UserCreate, UsersBatchCreate, UserUpdate, UserDisable, RefreshTokenRequest
+from app.utils.token import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth.refresh_tokens import refresh_token_store, RefreshTokenError
+from app.auth.msal_validator import msal_validator, MsalValidationError, MsalUnavailableError
+from app.utils.directory_authenticator import directory_authenticator, DirectoryUnavailableError
+from app.auth.roles import role_resolver
+from app.utils.directory_sync import directory_sync
+from app.utils.employee_roster import EmployeeRosterUnavailableError
+from app.utils.ldap_pool import directory_pool
 from datetime import datetime
-import jwt  # ← NUEVO: Para validar tokens MSAL
 from pydantic import BaseModel  # ← NUEVO: Para el modelo de request
 
 router = APIRouter()
-adapter = UserAdapter()
+
+def get_user_adapter(db: Session = Depends(get_db), async_db: AsyncSession = Depends(get_async_db)) -> UserAdapter:
+    """Adaptador con las sesiones propias de la solicitud (cada solicitud concurrente usa su propia conexión); las rutas async
+    usan los métodos "a" sobre la sesión asíncrona"""
+    return UserAdapter(db, async_db)
 
 # ← NUEVO: Modelo para recibir token MSAL
 class MSALTokenRequest(BaseModel):
@@ -156,11 +171,11 @@ class MSALTokenRequest(BaseModel):
 
 # ← NUEVO: Endpoint para validar MSAL y generar token interno
 @router.post("/validate-msal")
-def validate_msal_token(token_request: MSALTokenRequest):
+def validate_msal_token(token_request: MSALTokenRequest, adapter: UserAdapter = Depends(get_user_adapter)):
     """Valida token MSAL y genera token interno de 5 minutos"""
     try:
-        # 1. Decodificar token MSAL (sin verificar firma por simplicidad)
-        decoded = jwt.decode(token_request.id_token, options={"verify_signature": False})
+        # 1. Validar firma, emisor, audiencia y expiración del token MSAL contra el JWKS en caché
+        decoded = msal_validator.validate(token_request.id_token)
         
         # 2. Extraer información del usuario
         user_email = decoded.get('preferred_username', '').lower()
@@ -183,12 +198,14 @@ def validate_msal_token(token_request: MSALTokenRequest):
             "employee_data": empleado
         }
         
-        # 5. Generar token interno de 5 minutos
+        # 5. Generar token interno de 5 minutos (con el id de la sesión de refresh, para poder revocarla)
+        refresh_token, token_data = refresh_token_store.open_session(token_data)
         internal_token = create_access_token(token_data)
         
         return {
             "success": True,
             "access_token": internal_token,
+            "refresh_token": refresh_token,
             "token_type": "bearer",
             "expires_in": 300,  # 5 minutos
             "user": {
@@ -199,43 +216,120 @@ def validate_msal_token(token_request: MSALTokenRequest):
             }
         }
         
-    except jwt.InvalidTokenError:
+    except MsalUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"Validación MSAL no disponible: {e}")
+    except EmployeeRosterUnavailableError:
+        raise HTTPException(status_code=503, detail="Nómina de empleados no disponible, intente nuevamente")
+    except MsalValidationError:
         raise HTTPException(status_code=401, detail="Token MSAL inválido")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error procesando token: {str(e)}")
 
+async def _session_user_active(claims: dict, adapter: UserAdapter) -> bool:
+    """El usuario de la sesión sigue autorizado: empleado vigente (MSAL) o cuenta habilitada en AD y en la base de datos"""
+    subject = claims.get("sub") or ""
+    if claims.get("employee_id") is not None:
+        empleado = adapter.validate_employee_from_msal(claims.get("email"), claims.get("full_name"))
+        return empleado is not None and empleado["idEmpleado"] == claims["employee_id"]
+
+    if "@" in subject:
+        # Usuarios MSAL sin nómina: solo se puede verificar su cuenta si el índice local del directorio la tiene
+        record = directory_sync.lookup_mail(subject)
+        return record is None or record.enabled
+
+    # Sin índice local ni cuenta de servicio, AD solo se puede consultar con la contraseña del usuario
+    if directory_sync.ready or directory_pool.has_service_account:
+        status = (await directory_authenticator.run(adapter.validate_users_active_directory, [subject]))[subject]
+        if not status["exists"] or not status["enabled"]:
+            return False
+    # Una cuenta eliminada de la base de datos tampoco puede seguir renovando su sesión; un error de la base de datos no es
+    # "eliminada" (se propaga y la ruta responde 503 sin revocar)
+    user = await adapter.afind_user(subject)
+    return user is not None and user["status"] == 1
+
+@router.post("/refresh")
+async def refresh_access_token(request: RefreshTokenRequest, adapter: UserAdapter = Depends(get_user_adapter)):
+    """Renueva el access token con un refresh token (rotación con detección de reutilización), si el usuario sigue habilitado"""
+    # Se verifica al usuario antes de consumir el token: si AD no responde, el cliente reintenta con el mismo refresh token
+    try:
+        claims = refresh_token_store.peek(request.refresh_token)
+    except RefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+    try:
+        active = await _session_user_active(claims, adapter)
+    except DirectoryUnavailableError:
+        raise HTTPException(status_code=503, detail="Directorio activo no disponible, intente nuevamente")
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="Base de datos no disponible, intente nuevamente")
+    except EmployeeRosterUnavailableError:
+        raise HTTPException(status_code=503, detail="Nómina de empleados no disponible, intente nuevamente")
+    if not active:
+        refresh_token_store.revoke(request.refresh_token)
+        raise HTTPException(status_code=401, detail="Usuario deshabilitado o no autorizado",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+    try:
+        refresh_token, claims = refresh_token_store.rotate(request.refresh_token)
+    except RefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+    return {
+        "access_token": create_access_token(claims),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+@router.post("/logout")
+def logout(request: RefreshTokenRequest):
+    """Cierra la sesión: revoca el refresh token y toda su familia (no requiere un access token vigente)"""
+    refresh_token_store.revoke(request.refresh_token)
+    return {"message": "Sesión cerrada"}
+
 # ← Resto del código existente SIN CAMBIOS...
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), adapter: UserAdapter = Depends(get_user_adapter)):
     username = form_data.username
     password = form_data.password
     
-    # Validar en Directorio Activo
-    if not adapter.validate_user_active_directory(username, password):
+    # Validar en Directorio Activo (executor dedicado con plazo máximo, no ocupa el threadpool de las rutas)
+    try:
+        valid = await adapter.avalidate_user_active_directory(username, password)
+    except DirectoryUnavailableError:
+        raise HTTPException(status_code=503, detail="Directorio activo no disponible, intente nuevamente")
+    if not valid:
         raise HTTPException(status_code=401, detail="Credenciales inválidas en Directorio Activo")
     
     # Consultar usuario en BD
-    user = adapter.get_user_by_username(username)
+    user = await adapter.aget_user_by_username(username)
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no registrado en el sistema")
     
     if user["status"] != 1:
         raise HTTPException(status_code=403, detail="Usuario inactivo en el sistema")
     
-    # Construir payload del token
+    # Construir payload del token (perfil desde los grupos de AD leídos en la validación, ya en caché)
+    try:
+        perfil = await directory_authenticator.run(role_resolver.perfil_for_user, username, "admin")
+    except DirectoryUnavailableError:
+        raise HTTPException(status_code=503, detail="Directorio activo no disponible, intente nuevamente")
     user_data = {
         "sub": username,
-        "perfil": "admin",  # Opcional: puedes ajustarlo si tu tabla lo tiene
+        "perfil": perfil,
         "email": user["email"],
         "full_name": user["full_name"]
     }
     
     # Generar token con expiración
+    refresh_token, user_data = refresh_token_store.open_session(user_data)
     token = create_access_token(data=user_data)
     
     try:
-        adapter.update_user(
+        await adapter.aupdate_user(
             username=username,
             last_access=datetime.now(),
             actor=username,
@@ -246,17 +340,24 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
     
     return {
         "access_token": token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "status": "success"
     }
 
+@router.get("/me")
+def get_my_user(principal: Principal = Depends(get_current_principal)):
+    """Datos del usuario autenticado tomados del token (sin consultar la base de datos)"""
+    return principal.to_dict()
+
 @router.post("/get-user")
-def get_user_details(
+async def get_user_details(
     payload: UserLookup,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    adapter: UserAdapter = Depends(get_user_adapter)
 ):
     try:
-        user = adapter.get_user_by_username(payload.username)
+        user = await adapter.aget_user_by_username(payload.username)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
@@ -272,49 +373,71 @@ def get_user_details(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/")
-def create_user(
+async def create_user(
     user_data: UserCreate,
-    current_user: dict = Depends(get_current_user)
+    principal: Principal = Depends(get_current_principal),
+    adapter: UserAdapter = Depends(get_user_adapter)
 ):
     try:
-        response = adapter.create_user(
+        response = await adapter.acreate_user(
             user_data.username,
             user_data.full_name,
             user_data.email,
-            actor=current_user
+            actor=principal.username
         )
         return {"message": response}
+    except DirectoryUnavailableError:
+        raise HTTPException(status_code=503, detail="Directorio activo no disponible, intente nuevamente")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch")
+async def create_users_batch(
+    payload: UsersBatchCreate,
+    principal: Principal = Depends(get_current_principal),
+    adapter: UserAdapter = Depends(get_user_adapter)
+):
+    """Crea varios usuarios; la validación en Directorio Activo se hace en una sola pasada"""
+    if not payload.users:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un usuario")
+    try:
+        results = await adapter.acreate_users([user.model_dump() for user in payload.users], actor=principal.username)
+        return {"results": results}
+    except DirectoryUnavailableError:
+        raise HTTPException(status_code=503, detail="Directorio activo no disponible, intente nuevamente")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/")
-def modify_user(
+async def modify_user(
     payload: UserUpdate,
-    current_user: dict = Depends(get_current_user)
+    principal: Principal = Depends(get_current_principal),
+    adapter: UserAdapter = Depends(get_user_adapter)
 ):
     try:
-        response = adapter.update_user(
+        response = await adapter.aupdate_user(
             username=payload.username,
             full_name=payload.full_name,
             email=payload.email,
             status=payload.status,
-            actor=current_user
+            actor=principal.username
         )
         return {"message": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/disable")
-def disable_user(
+async def disable_user(
     request: UserDisable,
-    current_user: str = Depends(get_current_user)
+    principal: Principal = Depends(get_current_principal),
+    adapter: UserAdapter = Depends(get_user_adapter)
 ):
     log_action = "Habilitó usuario:" if request.status == 1 else "Deshabilitó usuario:"
     
     try:
-        response = adapter.update_user(
+        response = await adapter.aupdate_user(
             username=request.username,
-            actor=current_user,
+            actor=principal.username,
             status=request.status,
             log_action=log_action
         )
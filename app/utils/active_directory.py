@@ -6,7 +6,8 @@
 # (no deshabilitada). Si todo está correcto, imprime información del usuario (nombre y correo) y retorna True; de lo contrario,
 # retorna False y muestra mensajes de error o advertencia según el caso.
 
-from ldap3 import Server, Connection, ALL, NTLM
+from ldap3 import NTLM
+from app.utils.ldap_pool import get_directory_pool, USER_ATTRIBUTES, is_account_disabled, first_value
 
 def validate_user_ad(username: str, password: str, domain: str, ad_server: str, ad_base_dn: str):
     """
@@ -20,29 +21,27 @@ def validate_user_ad(username: str, password: str, domain: str, ad_server: str,
     :return: True si válido, False si no
     """
     try:
-        user = f"{domain}\\{username}"
-        server = Server(ad_server, get_info=ALL)
-        conn = Connection(server, user=user, password=password, authentication=NTLM, auto_bind=True)
-        
+        # Un pool por servidor/dominio: el bind NTLM (dominio\usuario) reutiliza conexiones ya abiertas
+        pool = get_directory_pool(ad_server, ad_base_dn, domain, authentication=NTLM)
+        authenticated, entry = pool.authenticate(username, password, USER_ATTRIBUTES)
+        if not authenticated:
+            print(f"Credenciales inválidas para {username} en AD.")
+            return False
+
         # Si queremos validar que el usuario existe y está activo:
-        search_filter = f"(&(sAMAccountName={username})"
-        conn.search(ad_base_dn, search_filter, attributes=['userAccountControl', 'displayName', 'mail'])
-        
-        if not conn.entries:
+        if not entry:
             print(f"Usuario {username} no encontrado en AD.")
             return False
         
         # Validar estado del usuario (userAccountControl)
-        entry = conn.entries[0]
-        user_account_control = int(entry.userAccountControl.value)
         # 2 = Cuenta deshabilitada
-        if user_account_control & 2:
+        if is_account_disabled(entry):
             print(f"Usuario {username} está deshabilitado.")
             return False
         
-        print(f"Usuario {username} válido en AD. Nombre: {entry.displayName.value}, Email: {entry.mail.value}")
+        print(f"Usuario {username} válido en AD. Nombre: {first_value(entry, 'displayName')}, Email: {first_value(entry, 'mail')}")
         return True
         
     except Exception as e:
         print(f"Error al validar usuario {username}: {e}")
-        return False
\ No newline at end of file
+        return False
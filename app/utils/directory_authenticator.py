@@ -0,0 +1,121 @@
+# Este código ejecuta las validaciones contra Active Directory fuera del threadpool compartido de FastAPI. ldap3 es síncrono, y si
+# los binds corren en el mismo threadpool que atiende las rutas síncronas, una ráfaga de logins con AD lento (receive_timeout de
+# 5 s) ocupa todos los hilos y deja sin atender las rutas de base de datos o de llaves. Aquí los binds corren en un executor propio
+# con un número acotado de hilos; las rutas async esperan el resultado sin bloquear el event loop. Cada intento tiene un plazo
+# máximo (deadline): si se supera, la petición recibe un error aunque el hilo siga esperando a AD. Si ya hay demasiados logins en
+# cola se rechazan de inmediato en lugar de acumular esperas. Se mide el tiempo en cola (desde que se pide el login hasta que un
+# hilo lo toma) y el tiempo de ejecución, para distinguir "AD lento" de "pocos hilos".
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+AD_AUTH_MAX_CONCURRENCY = int(os.getenv("AD_AUTH_MAX_CONCURRENCY", "8"))  # Hilos dedicados a binds LDAP
+AD_AUTH_MAX_PENDING = int(os.getenv("AD_AUTH_MAX_PENDING", "64"))  # Logins en curso + en cola antes de rechazar
+AD_AUTH_DEADLINE = float(os.getenv("AD_AUTH_DEADLINE", "8"))  # Segundos por intento, incluyendo el tiempo en cola
+
+
+class DirectoryUnavailableError(Exception):
+    pass
+
+
+class DirectoryBusyError(DirectoryUnavailableError):
+    pass
+
+
+class DirectoryTimeoutError(DirectoryUnavailableError):
+    pass
+
+
+class DirectoryAuthenticator:
+    def __init__(self, max_concurrency: int = AD_AUTH_MAX_CONCURRENCY, max_pending: int = AD_AUTH_MAX_PENDING,
+                 deadline: float = AD_AUTH_DEADLINE):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ldap-auth")
+        self._lock = threading.Lock()
+        self._queue_ms = deque(maxlen=1024)
+        self._run_ms = deque(maxlen=1024)
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _execute(self, submitted_at: float, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self._queue_ms.append((started - submitted_at) * 1000)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                self._run_ms.append((time.perf_counter() - started) * 1000)
+
+    async def run(self, fn, *args, deadline: float = None, **kwargs):
+        """Ejecuta fn(*args, **kwargs) en el executor de directorio y espera el resultado como máximo `deadline` segundos"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise DirectoryBusyError(f"Demasiadas validaciones de directorio en curso ({self.pending})")
+            self.pending += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(
+                self._executor, partial(self._execute, time.perf_counter(), fn, args, kwargs)
+            )
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+
+        try:
+            # shield: al vencer el plazo la petición termina, pero el hilo sigue ocupado hasta que ldap3 responda
+            return await asyncio.wait_for(asyncio.shield(future), deadline or self.deadline)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"⏱️ Validación de directorio superó el plazo de {deadline or self.deadline}s")
+            raise DirectoryTimeoutError("Active Directory no respondió a tiempo")
+
+    def stats(self) -> dict:
+        with self._lock:
+            queue_ms = sorted(self._queue_ms)
+            run_ms = sorted(self._run_ms)
+            counters = {
+                "max_concurrency": self.max_concurrency,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+        def percentile(samples, p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2) if samples else 0.0
+
+        counters["queue_ms"] = {"p50": percentile(queue_ms, 0.50), "p95": percentile(queue_ms, 0.95),
+                                "max": percentile(queue_ms, 1.0)}
+        counters["run_ms"] = {"p50": percentile(run_ms, 0.50), "p95": percentile(run_ms, 0.95),
+                              "max": percentile(run_ms, 1.0)}
+        return counters
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+directory_authenticator = DirectoryAuthenticator()
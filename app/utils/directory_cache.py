@@ -0,0 +1,60 @@
+# Este código guarda en memoria los atributos de Active Directory (userAccountControl, displayName, mail) ya consultados, indexados
+# por sAMAccountName, para que los logins repetidos de un mismo usuario no repitan la búsqueda LDAP. El bind con la contraseña del
+# usuario siempre se hace contra AD: solo la búsqueda de atributos se sirve desde la caché. Las cuentas activas se guardan con un
+# TTL configurable; los resultados "no encontrado" y "cuenta deshabilitada" se guardan con un TTL corto aparte, para que una cuenta
+# recién creada o rehabilitada en AD se reconozca pronto. Ofrece invalidación explícita por usuario o completa.
+
+import logging
+import os
+import time
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+AD_ATTRIBUTE_CACHE_MAX_SIZE = int(os.getenv("AD_ATTRIBUTE_CACHE_MAX_SIZE", "10000"))
+AD_ATTRIBUTE_CACHE_TTL = int(os.getenv("AD_ATTRIBUTE_CACHE_TTL", "900"))
+AD_ATTRIBUTE_CACHE_NEGATIVE_TTL = int(os.getenv("AD_ATTRIBUTE_CACHE_NEGATIVE_TTL", "60"))  # No encontrado / deshabilitado
+
+NOT_FOUND = False  # Valor guardado para usuarios que la búsqueda no encontró
+
+
+class DirectoryAttributeCache:
+    def __init__(self, max_size: int = AD_ATTRIBUTE_CACHE_MAX_SIZE, ttl: int = AD_ATTRIBUTE_CACHE_TTL,
+                 negative_ttl: int = AD_ATTRIBUTE_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(max_size=max_size)
+
+    @staticmethod
+    def _key(username: str) -> str:
+        # sAMAccountName no distingue mayúsculas en AD
+        return username.lower()
+
+    def get(self, username: str, attributes=None):
+        """Atributos cacheados, NOT_FOUND si el usuario no existe, o None si no hay entrada (o le faltan atributos pedidos)"""
+        entry = self._cache.get(self._key(username))
+        if entry is NOT_FOUND or entry is None:
+            return entry
+        if attributes and any(name not in entry for name in attributes):
+            return None
+        return entry
+
+    def set(self, username: str, entry: dict, disabled: bool = False):
+        ttl = self.negative_ttl if disabled else self.ttl
+        self._cache.set(self._key(username), entry, expires_at=time.time() + ttl)
+
+    def set_not_found(self, username: str):
+        self._cache.set(self._key(username), NOT_FOUND, expires_at=time.time() + self.negative_ttl)
+
+    def invalidate(self, username: str) -> bool:
+        removed = self._cache.delete(self._key(username))
+        if removed:
+            logger.info(f"🧹 Atributos de AD de {username} eliminados de la caché")
+        return removed
+
+    def clear(self):
+        self._cache.clear()
+        logger.info("🧹 Caché de atributos de AD vaciada")
+
+    def stats(self) -> dict:
+        return self._cache.stats()
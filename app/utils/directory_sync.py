@@ -0,0 +1,289 @@
+# Este código mantiene en memoria una copia indexada de los usuarios de OU=Banistmo en Active Directory, para responder en
+# microsegundos si un usuario existe, si su cuenta está habilitada y cuál es su nombre y correo, sin una consulta LDAP por usuario.
+# Un hilo en segundo plano hace primero una búsqueda paginada completa de la OU y después sincronizaciones incrementales: solo pide
+# las entradas con uSNChanged mayor al más alto ya visto. Las cuentas eliminadas o movidas fuera de la OU no aparecen en esa
+# búsqueda, así que cada AD_SYNC_RECONCILE_INTERVAL_SECONDS una búsqueda paginada que solo trae sAMAccountName quita del índice
+# las que ya no están (una cuenta eliminada deja de renovar sesiones en minutos, no al vencer la carga completa). Como uSNChanged
+# es propio de cada controlador de dominio, cada cierto tiempo se repite además la carga completa, que reemplaza el índice de una
+# sola vez.
+# Por eso la sincronización se fija al controlador de la última carga completa y solo cambia de controlador (con carga completa)
+# cuando ese falla, aunque el pool considere más rápido a otro.
+# La conexión se obtiene de una fábrica inyectable (por defecto, el pool de servicio de ldap_pool), de modo que la sincronización
+# puede probarse contra la estrategia MOCK_SYNC de ldap3. Si no hay cuenta de servicio configurada, la sincronización no se inicia
+# y las consultas siguen yendo a AD.
+
+import logging
+import os
+import threading
+import time
+from app.utils.ldap_pool import directory_pool, AD_BASE_DN, ACCOUNT_DISABLED, first_value
+
+logger = logging.getLogger(__name__)
+
+AD_SYNC_ENABLED = os.getenv("AD_SYNC_ENABLED", "true").lower() == "true"
+AD_SYNC_INTERVAL_SECONDS = int(os.getenv("AD_SYNC_INTERVAL_SECONDS", "300"))
+AD_SYNC_FULL_INTERVAL_SECONDS = int(os.getenv("AD_SYNC_FULL_INTERVAL_SECONDS", "21600"))
+AD_SYNC_RECONCILE_INTERVAL_SECONDS = int(os.getenv("AD_SYNC_RECONCILE_INTERVAL_SECONDS", "900"))  # 0 = solo la carga completa
+AD_SYNC_PAGE_SIZE = int(os.getenv("AD_SYNC_PAGE_SIZE", "500"))
+
+SYNC_FILTER = "(&(objectClass=user)(sAMAccountName=*))"
+SYNC_ATTRIBUTES = ["sAMAccountName", "userAccountControl", "displayName", "mail", "uSNChanged", "pwdLastSet"]
+RECONCILE_ATTRIBUTES = ["sAMAccountName"]
+
+
+class DirectoryRecord:
+    __slots__ = ("username", "dn", "display_name", "mail", "user_account_control", "usn_changed", "pwd_last_set")
+
+    def __init__(self, username: str, dn: str, display_name: str, mail: str, user_account_control: int, usn_changed: int,
+                 pwd_last_set: str = None):
+        self.username = username
+        self.dn = dn
+        self.display_name = display_name
+        self.mail = mail
+        self.user_account_control = user_account_control
+        self.usn_changed = usn_changed
+        self.pwd_last_set = pwd_last_set  # Texto, para comparar sin importar si el esquema lo decodificó como fecha
+
+    @property
+    def enabled(self) -> bool:
+        return not self.user_account_control & ACCOUNT_DISABLED
+
+    @classmethod
+    def from_entry(cls, entry: dict):
+        attributes = entry["attributes"]
+        username = first_value(attributes, "sAMAccountName")
+        if not username:
+            return None
+        return cls(
+            username=username,
+            dn=entry.get("dn"),
+            display_name=first_value(attributes, "displayName"),
+            mail=first_value(attributes, "mail"),
+            user_account_control=int(first_value(attributes, "userAccountControl") or 0),
+            usn_changed=int(first_value(attributes, "uSNChanged") or 0),
+            pwd_last_set=str(first_value(attributes, "pwdLastSet")),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "username": self.username,
+            "full_name": self.display_name,
+            "email": self.mail,
+            "enabled": self.enabled,
+        }
+
+
+class DirectoryIndex:
+    def __init__(self, records=()):
+        self.by_username = {}
+        self.by_mail = {}
+        self.highest_usn = 0
+        for record in records:
+            self.put(record)
+
+    def put(self, record: DirectoryRecord):
+        key = record.username.lower()
+        previous = self.by_username.get(key)
+        if previous is not None and previous.mail:
+            self.by_mail.pop(previous.mail.lower(), None)
+        self.by_username[key] = record
+        if record.mail:
+            self.by_mail[record.mail.lower()] = record
+        self.highest_usn = max(self.highest_usn, record.usn_changed)
+
+    def remove(self, key: str):
+        record = self.by_username.pop(key, None)
+        if record is not None and record.mail and self.by_mail.get(record.mail.lower()) is record:
+            del self.by_mail[record.mail.lower()]
+
+    def copy(self):
+        copied = DirectoryIndex()
+        copied.by_username = dict(self.by_username)
+        copied.by_mail = dict(self.by_mail)
+        copied.highest_usn = self.highest_usn
+        return copied
+
+    def __len__(self):
+        return len(self.by_username)
+
+
+class DirectorySync:
+    def __init__(self, connection_factory=None, base_dn: str = AD_BASE_DN, page_size: int = AD_SYNC_PAGE_SIZE,
+                 interval_seconds: int = AD_SYNC_INTERVAL_SECONDS,
+                 full_interval_seconds: int = AD_SYNC_FULL_INTERVAL_SECONDS,
+                 reconcile_interval_seconds: int = AD_SYNC_RECONCILE_INTERVAL_SECONDS):
+        """
+        :param connection_factory: Callable(prefer_host) que devuelve un context manager con una conexión ldap3 ya enlazada,
+            del controlador prefer_host si está disponible
+        """
+        self.connection_factory = connection_factory or directory_pool.service_connection
+        self.base_dn = base_dn
+        self.page_size = page_size
+        self.interval_seconds = interval_seconds
+        self.full_interval_seconds = full_interval_seconds
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+        self._index = None  # None hasta la primera carga completa
+        self._sync_lock = threading.RLock()  # Una sola sincronización a la vez; las lecturas no bloquean
+        self.source_host = None  # Controlador de dominio de la última carga completa (uSNChanged es propio de cada uno)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_full_sync = 0.0
+        self.last_sync = 0.0
+        self.last_reconcile = 0.0
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.reconciles = 0
+        self.removed = 0
+        self.errors = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def _search(self, search_filter: str):
+        """:return: (registros, host del controlador que respondió)"""
+        with self.connection_factory(prefer_host=self.source_host) as conn:
+            entries = self._paged_search(conn, search_filter, SYNC_ATTRIBUTES)
+            records = []
+            for entry in entries or []:
+                if entry.get("type") == "searchResEntry":
+                    record = DirectoryRecord.from_entry(entry)
+                    if record is not None:
+                        records.append(record)
+            return records, conn.server.host
+
+    def _paged_search(self, conn, search_filter: str, attributes: list):
+        return conn.extend.standard.paged_search(
+            self.base_dn, search_filter, attributes=attributes, paged_size=self.page_size, generator=False
+        )
+
+    def full_sync(self) -> int:
+        with self._sync_lock:
+            start = time.perf_counter()
+            records, self.source_host = self._search(SYNC_FILTER)
+            index = DirectoryIndex(records)
+            self._index = index  # Reemplazo atómico: los lectores ven el índice anterior o el nuevo completo
+            self.last_full_sync = self.last_sync = self.last_reconcile = time.time()
+            self.full_syncs += 1
+            logger.info(f"📥 Directorio sincronizado: {len(index)} usuarios en {(time.perf_counter() - start) * 1000:.0f} ms")
+            return len(index)
+
+    def incremental_sync(self) -> int:
+        if self._index is None:
+            return self.full_sync()
+
+        with self._sync_lock:
+            index = self._index
+            changed, host = self._search(f"(&{SYNC_FILTER}(uSNChanged>={index.highest_usn + 1}))")
+            if host != self.source_host:
+                # El controlador fijado falló y respondió otro: sus uSNChanged no son comparables, se recarga todo desde él
+                logger.info(f"Controlador de dominio cambió ({self.source_host} -> {host}) - carga completa")
+                return self.full_sync()
+            # Copia y reemplazo, para que los lectores nunca vean el índice a medio actualizar
+            updated = index.copy()
+            for record in changed:
+                updated.put(record)
+            self._index = updated
+            self.last_sync = time.time()
+            self.incremental_syncs += 1
+            if changed:
+                logger.info(f"🔄 Directorio: {len(changed)} usuarios actualizados (uSNChanged > {index.highest_usn})")
+            return len(changed)
+
+    def reconcile(self) -> int:
+        """
+        Quita del índice las cuentas que ya no existen en la OU (eliminadas o movidas), que la búsqueda por uSNChanged no
+        devuelve. :return: Cantidad de cuentas quitadas
+        """
+        if self._index is None:
+            return 0
+
+        with self._sync_lock:
+            start = time.perf_counter()
+            with self.connection_factory(prefer_host=self.source_host) as conn:
+                entries = self._paged_search(conn, SYNC_FILTER, RECONCILE_ATTRIBUTES)
+                present = set()
+                for entry in entries or []:
+                    if entry.get("type") == "searchResEntry":
+                        username = first_value(entry["attributes"], "sAMAccountName")
+                        if username:
+                            present.add(username.lower())
+            index = self._index
+            gone = [key for key in index.by_username if key not in present]
+            if gone:
+                updated = index.copy()
+                for key in gone:
+                    updated.remove(key)
+                self._index = updated
+                logger.info(f"🧹 Directorio: {len(gone)} usuarios eliminados o movidos fuera de la OU "
+                            f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+            self.last_reconcile = time.time()
+            self.reconciles += 1
+            self.removed += len(gone)
+            return len(gone)
+
+    def sync(self) -> int:
+        if self._index is None or time.time() - self.last_full_sync >= self.full_interval_seconds:
+            return self.full_sync()
+        changed = self.incremental_sync()
+        if self.reconcile_interval_seconds and time.time() - self.last_reconcile >= self.reconcile_interval_seconds:
+            self.reconcile()
+        return changed
+
+    def lookup(self, username: str) -> DirectoryRecord:
+        index = self._index
+        return index.by_username.get(username.lower()) if index is not None and username else None
+
+    def lookup_mail(self, mail: str) -> DirectoryRecord:
+        index = self._index
+        return index.by_mail.get(mail.lower()) if index is not None and mail else None
+
+    def _run(self):
+        # La carga inicial también corre en este hilo: el arranque de la app no espera a la búsqueda paginada completa, y
+        # mientras tanto las consultas van a AD (ready es False)
+        delay = 0
+        while not self._stop.wait(delay):
+            delay = self.interval_seconds
+            try:
+                self.sync()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error sincronizando el directorio: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ad-directory-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "ready": index is not None,
+            "users": len(index) if index is not None else 0,
+            "highest_usn": index.highest_usn if index is not None else 0,
+            "source_host": self.source_host,
+            "last_full_sync": self.last_full_sync,
+            "last_sync": self.last_sync,
+            "full_syncs": self.full_syncs,
+            "incremental_syncs": self.incremental_syncs,
+            "last_reconcile": self.last_reconcile,
+            "reconciles": self.reconciles,
+            "removed": self.removed,
+            "errors": self.errors,
+        }
+
+
+directory_sync = DirectorySync()
+
+
+def start_directory_sync():
+    if AD_SYNC_ENABLED and directory_pool.has_service_account:
+        directory_sync.start()
+    else:
+        logger.info("Sincronización del directorio deshabilitada (AD_SYNC_ENABLED o cuenta de servicio no configurada)")
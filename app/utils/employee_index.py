@@ -0,0 +1,300 @@
+# Este código busca en la nómina de empleados autorizados al usuario que inicia sesión con MSAL, con las mismas reglas de
+# coincidencia que el frontend (por correo corporativo y por nombre), pero sin recorrer la nómina completa en cada login.
+# match_by_email y match_by_name son las reglas originales, aplicadas a un solo empleado. EmployeeIndex construye una vez índices
+# invertidos sobre la nómina y responde con el mismo resultado que recorrerla en orden y devolver el primer empleado que cumpla
+# alguna de las dos reglas:
+#   - Correo: el dominio de Banistmo se verifica una vez por consulta; luego cada subcadena del correo (de 3+ caracteres) se busca
+#     en el índice de partes de nombre, que es lo mismo que preguntar si alguna parte del nombre aparece dentro del correo.
+#   - Nombre completo: "nombre del empleado dentro del nombre del usuario" se resuelve buscando las subcadenas del nombre del usuario
+#     en un diccionario de nombres; "nombre del usuario dentro del nombre del empleado" con una sola búsqueda (str.find, en C) sobre
+#     los nombres concatenados en orden, donde la primera aparición corresponde al primer empleado.
+#   - Partes del nombre: para cada parte del usuario se obtienen las partes de empleados contenidas en ella (subcadenas) o que la
+#     contienen (trigramas sobre el vocabulario de partes), y se cuentan las coincidencias por empleado.
+# Las listas de cada índice guardan posiciones de la nómina en orden ascendente, de modo que el menor índice es el primer empleado
+# que habría encontrado el recorrido lineal. search_name agrega una búsqueda por similitud sin tildes (name_similarity) sobre los
+# mismos nombres. Las posiciones se guardan en arrays de 4 bytes en lugar de listas de enteros de Python. Al final hay un benchmark con una nómina sintética de 100k empleados que mide también tiempo de construcción y memoria.
+
+import logging
+from array import array
+from bisect import bisect_right
+from app.utils.name_similarity import NameTrigramIndex, EMPLOYEE_NAME_TOP_K, EMPLOYEE_NAME_SIMILARITY
+
+logger = logging.getLogger(__name__)
+
+DOMINIOS_BANISTMO = ['banistmo.com', 'banistmo.pa', 'banistmo.com.pa']
+MIN_PART_LENGTH = 3  # Las reglas solo consideran partes de más de 2 caracteres
+NAME_SEPARATOR = "\x00"
+
+
+def match_by_email(user_email: str, empleado_nombre: str) -> bool:
+    """Misma lógica que el frontend para verificar email"""
+    if not user_email:
+        return False
+
+    email = user_email.lower()
+
+    # Verificar dominio
+    es_banistmo = any(dominio in email for dominio in DOMINIOS_BANISTMO)
+    if not es_banistmo:
+        return False
+
+    # Verificar nombre en email
+    nombre_partes = empleado_nombre.lower().split(' ')
+    nombre_partes = [parte for parte in nombre_partes if len(parte) > 2]
+    return any(parte in email for parte in nombre_partes)
+
+
+def match_by_name(user_name: str, empleado_nombre: str) -> bool:
+    """Misma lógica que el frontend para verificar nombre"""
+    if not user_name or len(user_name) < 3:
+        return False
+
+    user_name_clean = user_name.lower().strip()
+    empleado_name_clean = empleado_nombre.lower().strip()
+
+    # Verificar coincidencia completa
+    if empleado_name_clean in user_name_clean or user_name_clean in empleado_name_clean:
+        return True
+
+    # Verificar partes del nombre (requiere 2+ coincidencias)
+    user_parts = [part for part in user_name_clean.split(' ') if len(part) > 2]
+    empleado_parts = [part for part in empleado_name_clean.split(' ') if len(part) > 2]
+
+    coincidencias = []
+    for user_part in user_parts:
+        for emp_part in empleado_parts:
+            if emp_part in user_part or user_part in emp_part:
+                coincidencias.append(user_part)
+                break
+
+    return len(coincidencias) >= 2
+
+
+def _parts(text: str) -> list:
+    return [part for part in text.split(' ') if len(part) >= MIN_PART_LENGTH]
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _substrings(text: str, min_length: int, max_length: int):
+    for i in range(len(text)):
+        for j in range(i + min_length, min(len(text), i + max_length) + 1):
+            yield text[i:j]
+
+
+class EmployeeIndex:
+    def __init__(self, employees, names=None):
+        """
+        :param employees: Secuencia indexable de empleados (lista de dicts o nómina en columnas)
+        :param names: Nombres por posición, si ya están disponibles sin construir cada empleado
+        """
+        self.employees = employees
+        self._part_trigrams = {}  # trigrama -> partes del vocabulario que lo contienen
+        self._full_names = {}  # nombre normalizado -> primera posición
+        self._word_bigrams = set()  # bigramas de las palabras de los nombres (vocabulario pequeño, para descartar rápido)
+        self._max_full_name = 0
+
+        if names is None:
+            names = [empleado['nombre'] for empleado in employees]
+        name_parts = {}
+        words = set()
+        joined = []  # Nombres normalizados separados por NAME_SEPARATOR, para buscar "nombre del usuario dentro del empleado"
+        self._offsets = array("I")  # Inicio de cada nombre en self._joined
+        offset = 0
+        padded = False  # Algún nombre con espacios al inicio o al final: sus partes para el correo difieren
+        for position, nombre in enumerate(names):
+            lowered = nombre.lower()
+            clean = lowered.strip()
+            if clean != lowered:
+                padded = True
+            self._full_names.setdefault(clean, position)
+            joined.append(clean)
+            self._offsets.append(offset)
+            offset += len(clean) + len(NAME_SEPARATOR)
+            if len(clean) > self._max_full_name:
+                self._max_full_name = len(clean)
+
+            for word in clean.split(' '):
+                if word not in words:
+                    words.add(word)
+                    self._word_bigrams.update(word[i:i + 2] for i in range(len(word) - 1))
+            for part in set(_parts(clean)):
+                postings = name_parts.get(part)
+                if postings is None:
+                    postings = name_parts[part] = []
+                    for trigram in _trigrams(part):
+                        self._part_trigrams.setdefault(trigram, set()).add(part)
+                postings.append(position)
+
+        self._joined = NAME_SEPARATOR.join(joined)
+        self._has_separator = any(NAME_SEPARATOR in clean for clean in joined)
+
+        # Posiciones en arrays de 4 bytes en lugar de listas de enteros de Python
+        self._name_parts = {part: array("I", postings) for part, postings in name_parts.items()}  # nombre.lower().strip()
+        self._max_name_part = max(map(len, self._name_parts), default=0)
+        if padded:
+            email_parts = {}
+            for position, nombre in enumerate(names):
+                for part in set(_parts(nombre.lower())):
+                    email_parts.setdefault(part, []).append(position)
+            self._email_parts = {part: array("I", postings) for part, postings in email_parts.items()}  # nombre.lower()
+            self._max_email_part = max(map(len, self._email_parts), default=0)
+        else:
+            self._email_parts = self._name_parts
+            self._max_email_part = self._max_name_part
+        self._similar = NameTrigramIndex(names)
+
+    def __len__(self):
+        return len(self.employees)
+
+    def _first_email_match(self, user_email: str):
+        if not user_email:
+            return None
+        email = user_email.lower()
+        if not any(dominio in email for dominio in DOMINIOS_BANISTMO):
+            return None
+
+        first = None
+        for candidate in _substrings(email, MIN_PART_LENGTH, self._max_email_part):
+            postings = self._email_parts.get(candidate)
+            if postings is not None and (first is None or postings[0] < first):
+                first = postings[0]
+        return first
+
+    def _first_containing(self, text: str):
+        """Primera posición cuyo nombre normalizado contiene text"""
+        if not self._offsets:
+            return None
+        # Un trigrama de text sin espacios está dentro de alguna parte (de 3+ caracteres) de todo nombre que contenga a text, y
+        # un bigrama sin espacios, dentro de alguna palabra: si falta alguno no hace falta recorrer los nombres
+        if any(" " not in trigram and trigram not in self._part_trigrams for trigram in _trigrams(text)):
+            return None
+        if any(" " not in text[i:i + 2] and text[i:i + 2] not in self._word_bigrams for i in range(len(text) - 1)):
+            return None
+        if NAME_SEPARATOR in text or self._has_separator:
+            return next((i for i in range(len(self._offsets)) if text in self._name(i)), None)
+        # Los nombres están concatenados en orden: la primera aparición es la del menor índice
+        found = self._joined.find(text)
+        return bisect_right(self._offsets, found) - 1 if found >= 0 else None
+
+    def _name(self, position: int) -> str:
+        end = self._offsets[position + 1] - len(NAME_SEPARATOR) if position + 1 < len(self._offsets) else len(self._joined)
+        return self._joined[self._offsets[position]:end]
+
+    def _related_positions(self, user_part: str) -> set:
+        """Empleados con alguna parte contenida en user_part o que contiene a user_part"""
+        tokens = {s for s in _substrings(user_part, MIN_PART_LENGTH, self._max_name_part) if s in self._name_parts}
+        trigram_sets = [self._part_trigrams.get(trigram) for trigram in _trigrams(user_part)]
+        if trigram_sets and all(trigram_sets):
+            rarest = min(trigram_sets, key=len)
+            tokens.update(token for token in rarest if user_part in token)
+
+        positions = set()
+        for token in tokens:
+            positions.update(self._name_parts[token])
+        return positions
+
+    def _first_name_match(self, user_name: str):
+        if not user_name or len(user_name) < 3:
+            return None
+        user_clean = user_name.lower().strip()
+        candidates = []
+
+        # Nombre del empleado contenido en el del usuario (incluye nombres vacíos, contenidos en cualquier texto)
+        full = [self._full_names[s] for s in _substrings(user_clean, 1, self._max_full_name) if s in self._full_names]
+        if "" in self._full_names:
+            full.append(self._full_names[""])
+        if full:
+            candidates.append(min(full))
+
+        # Nombre del usuario contenido en el del empleado
+        containing = self._first_containing(user_clean)
+        if containing is not None:
+            candidates.append(containing)
+
+        # Dos o más partes del usuario relacionadas con partes del empleado (cada parte repetida cuenta otra vez)
+        user_parts = _parts(user_clean)
+        if len(user_parts) >= 2:
+            counts = {}
+            related_cache = {}
+            for part in user_parts:
+                related = related_cache.get(part)
+                if related is None:
+                    related = related_cache[part] = self._related_positions(part)
+                for position in related:
+                    counts[position] = counts.get(position, 0) + 1
+            matched = [position for position, count in counts.items() if count >= 2]
+            if matched:
+                candidates.append(min(matched))
+
+        return min(candidates) if candidates else None
+
+    def match(self, user_email: str, user_name: str) -> dict:
+        """Primer empleado (en orden de la nómina) que coincide por correo o por nombre, o None"""
+        candidates = [p for p in (self._first_email_match(user_email), self._first_name_match(user_name)) if p is not None]
+        return self.employees[min(candidates)] if candidates else None
+
+    def search_name(self, user_name: str, k: int = EMPLOYEE_NAME_TOP_K, threshold: float = EMPLOYEE_NAME_SIMILARITY) -> list:
+        """Empleados con nombre parecido sin importar tildes: [(similitud, empleado)] de mayor a menor similitud"""
+        return [(score, self.employees[position]) for score, position in self._similar.search(user_name, k, threshold)]
+
+
+def linear_match(employees, user_email: str, user_name: str) -> dict:
+    """Recorrido lineal original, como referencia"""
+    for empleado in employees:
+        if match_by_email(user_email, empleado['nombre']) or match_by_name(user_name, empleado['nombre']):
+            return empleado
+    return None
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(7)
+    nombres = ["Luis", "María", "José", "Carmen", "Roberto", "Ana", "Pedro", "Sofía", "Juan", "Elena", "Carlos", "Isabel",
+               "Miguel", "Patricia", "Jorge", "Lucía", "Andrés", "Valeria", "Diego", "Camila", "Ricardo", "Gabriela"]
+    apellidos = ["Reyes", "Pinilla", "Rodríguez", "Santos", "Méndez", "Vargas", "González", "López", "Herrera", "Díaz",
+                 "Morales", "Cruz", "Castillo", "Ruiz", "Vega", "Peña", "Batista", "Quintero", "Sánchez", "Ortega"]
+
+    def random_name():
+        return " ".join([random.choice(nombres), random.choice(nombres), random.choice(apellidos),
+                         random.choice(apellidos)]) + f" {random.randint(0, 99999):05d}"
+
+    roster = [{"idEmpleado": i, "nombre": random_name(), "cedula": f"8-{i}", "nombreEmpresa": "BANISTMO S.A."}
+              for i in range(100_000)]
+
+    start = time.perf_counter()
+    index = EmployeeIndex(roster)
+    print(f"Índice construido para {len(index)} empleados en {time.perf_counter() - start:.2f} s")
+
+    import tracemalloc
+    tracemalloc.start()
+    traced = EmployeeIndex(roster)
+    print(f"Memoria del índice: {tracemalloc.get_traced_memory()[0] / len(traced):.0f} bytes por empleado")
+    tracemalloc.stop()
+    del traced
+
+    queries = []
+    for _ in range(200):
+        target = random.choice(roster)["nombre"]
+        queries.append(("", target))  # nombre exacto
+        queries.append((f"{target.split(' ')[0].lower()}.x@banistmo.com", "Usuario Externo"))  # correo
+        queries.append(("alguien@otro.com", " ".join(target.split(" ")[1:3])))  # partes del nombre
+        queries.append(("nadie@gmail.com", "Zz Qq"))  # sin coincidencia
+
+    sample = queries[:20]
+    start = time.perf_counter()
+    expected = [linear_match(roster, email, name) for email, name in sample]
+    linear_ms = (time.perf_counter() - start) * 1000 / len(sample)
+
+    start = time.perf_counter()
+    for email, name in queries:
+        index.match(email, name)
+    index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    assert [index.match(email, name) for email, name in sample] == expected, "El índice no coincide con el recorrido lineal"
+    print(f"Recorrido lineal: {linear_ms:.2f} ms/consulta")
+    print(f"Índice:           {index_ms:.3f} ms/consulta ({linear_ms / index_ms:.0f}x)")
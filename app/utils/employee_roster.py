@@ -0,0 +1,245 @@
+# Este código carga la nómina de empleados autorizados a iniciar sesión con MSAL desde una tabla de la base de datos o desde un
+# archivo CSV / NDJSON, en lugar de la lista fija MOCK_EMPLEADOS de UserAdapter (que solo se usa si no hay fuente configurada;
+# con una fuente configurada, mientras termina la primera carga o si esta falla no se autoriza a nadie y match / search_name
+# lanzan EmployeeRosterUnavailableError, que /validate-msal responde con 503). La nómina se guarda en
+# columnas (ids en un array, nombres y cédulas en listas, empresas codificadas como diccionario): unos 180 bytes por empleado, y
+# el EmployeeIndex de employee_index que se construye sobre ella suma unos 200 más con nombres y apellidos repetidos, y hasta
+# ~500 si casi cada nombre trae una parte única, como en el benchmark de employee_index (a 100k empleados, entre 40 y 70 MB en
+# total y unos 3 s de construcción en Python). Un hilo en segundo plano hace la carga inicial, para no demorar el arranque, y
+# luego consulta cada cierto tiempo la versión de la fuente (fecha y tamaño del archivo, o conteo y checksum de la tabla) y solo
+# si cambió vuelve a cargarla: la nómina y su índice nuevos se construyen aparte y se publican con un único reemplazo de
+# referencia, así que las consultas nunca se bloquean ni ven una nómina a medias. Si una recarga falla se conserva la nómina
+# anterior.
+
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from sqlalchemy import text
+from app.utils.employee_index import EmployeeIndex
+from app.utils.name_similarity import EMPLOYEE_NAME_TOP_K, EMPLOYEE_NAME_SIMILARITY
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_ROSTER_SOURCE = os.getenv("EMPLOYEE_ROSTER_SOURCE", "")  # Ruta .csv / .ndjson / .jsonl, o "db"; vacío = MOCK_EMPLEADOS
+EMPLOYEE_ROSTER_TABLE = os.getenv("EMPLOYEE_ROSTER_TABLE", "dbo.empleados_autorizados")
+EMPLOYEE_ROSTER_RELOAD_SECONDS = int(os.getenv("EMPLOYEE_ROSTER_RELOAD_SECONDS", "60"))
+
+DATABASE_SOURCE = "db"
+TABLE_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+class EmployeeRosterUnavailableError(Exception):
+    """Hay una fuente de nómina configurada pero todavía no se ha cargado ninguna nómina de ella"""
+
+
+class EmployeeRoster:
+    """Nómina en columnas; roster[i] devuelve el empleado con la misma forma que MOCK_EMPLEADOS"""
+    __slots__ = ("ids", "names", "cedulas", "company_codes", "companies")
+
+    def __init__(self, rows=()):
+        self.ids = array("q")
+        self.names = []
+        self.cedulas = []
+        self.company_codes = array("I")
+        self.companies = []  # Pocas empresas distintas: cada empleado guarda solo su código
+        codes = {}
+        for row in rows:
+            nombre = row.get("nombre")
+            if row.get("idEmpleado") in (None, "") or not nombre:
+                continue
+            company = str(row.get("nombreEmpresa") or "")
+            code = codes.get(company)
+            if code is None:
+                code = codes[company] = len(self.companies)
+                self.companies.append(company)
+            self.ids.append(int(row["idEmpleado"]))
+            self.names.append(str(nombre))
+            self.cedulas.append(str(row.get("cedula") or ""))
+            self.company_codes.append(code)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position: int) -> dict:
+        return {
+            "idEmpleado": self.ids[position],
+            "nombre": self.names[position],
+            "cedula": self.cedulas[position],
+            "nombreEmpresa": self.companies[self.company_codes[position]],
+        }
+
+
+class RosterSnapshot:
+    __slots__ = ("employees", "index", "version", "source", "loaded_at")
+
+    def __init__(self, employees, version: str, source: str, names=None):
+        self.employees = employees
+        self.index = EmployeeIndex(employees, names=names)
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+
+
+class EmployeeRosterLoader:
+    def __init__(self, source: str = EMPLOYEE_ROSTER_SOURCE, table: str = EMPLOYEE_ROSTER_TABLE,
+                 reload_seconds: int = EMPLOYEE_ROSTER_RELOAD_SECONDS, session_factory=None):
+        """
+        :param source: Archivo CSV / NDJSON, "db" para la tabla, o vacío para usar solo el respaldo
+        :param session_factory: Fábrica de sesiones SQLAlchemy para la fuente "db" (por defecto, SessionLocal)
+        """
+        if source == DATABASE_SOURCE and not TABLE_NAME_PATTERN.match(table):
+            raise ValueError(f"Nombre de tabla de nómina inválido: {table}")
+        self.source = source
+        self.table = table
+        self.reload_seconds = reload_seconds
+        self.session_factory = session_factory
+        self._snapshot = None  # None hasta la primera carga
+        self._fallback = None  # Solo sin fuente configurada
+        self._reload_lock = threading.Lock()  # Una sola recarga a la vez; las lecturas no bloquean
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.errors = 0
+        self.last_check = 0.0
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.source)
+
+    def set_fallback(self, employees):
+        self._fallback = RosterSnapshot(employees, version="fallback", source="MOCK_EMPLEADOS")
+
+    @property
+    def snapshot(self) -> RosterSnapshot:
+        # Con una fuente configurada nunca se usa el respaldo: autorizaría empleados que la nómina real no tiene
+        return self._snapshot if self.is_configured else self._fallback
+
+    @property
+    def ready(self) -> bool:
+        return not self.is_configured or self._snapshot is not None
+
+    def _current(self) -> RosterSnapshot:
+        if not self.ready:
+            raise EmployeeRosterUnavailableError(f"Nómina de empleados aún no cargada desde {self.source}")
+        return self.snapshot
+
+    def match(self, user_email: str, user_name: str) -> dict:
+        """:raises EmployeeRosterUnavailableError: Si la fuente configurada todavía no se ha podido cargar"""
+        snapshot = self._current()
+        return snapshot.index.match(user_email, user_name) if snapshot is not None else None
+
+    def search_name(self, user_name: str, k: int = EMPLOYEE_NAME_TOP_K, threshold: float = EMPLOYEE_NAME_SIMILARITY) -> list:
+        """:raises EmployeeRosterUnavailableError: Si la fuente configurada todavía no se ha podido cargar"""
+        snapshot = self._current()
+        return snapshot.index.search_name(user_name, k, threshold) if snapshot is not None else []
+
+    def _session(self):
+        if self.session_factory is None:
+            # Import diferido: con una fuente de archivo no hace falta el driver ODBC
+            from app.db.session_windows import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+    def source_version(self) -> str:
+        if self.source == DATABASE_SOURCE:
+            with self._session() as session:
+                count, checksum = session.execute(
+                    text(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {self.table}")
+                ).one()
+            return f"{count}:{checksum}"
+        stat = os.stat(self.source)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _read_rows(self):
+        # Las filas se recorren una a una: solo la nómina en columnas queda en memoria
+        if self.source == DATABASE_SOURCE:
+            with self._session() as session:
+                result = session.execute(
+                    text(f"SELECT idEmpleado, nombre, cedula, nombreEmpresa FROM {self.table} ORDER BY idEmpleado")
+                )
+                for row in result:
+                    yield row._mapping
+            return
+
+        with open(self.source, encoding="utf-8-sig", newline="") as f:
+            if self.source.lower().endswith(".csv"):
+                yield from csv.DictReader(f)
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def reload(self, force: bool = False) -> bool:
+        """Recarga la nómina si la versión de la fuente cambió. :return: True si se publicó una nómina nueva"""
+        if not self.is_configured:
+            return False
+        with self._reload_lock:
+            self.last_check = time.time()
+            # La versión se lee antes que las filas: si la fuente cambia durante la carga, la siguiente revisión la recarga
+            version = self.source_version()
+            current = self._snapshot
+            if not force and current is not None and current.version == version:
+                return False
+
+            start = time.perf_counter()
+            roster = EmployeeRoster(self._read_rows())
+            self._snapshot = RosterSnapshot(roster, version=version, source=self.source, names=roster.names)
+            self.reloads += 1
+            logger.info(f"👥 Nómina cargada desde {self.source}: {len(roster)} empleados "
+                        f"en {(time.perf_counter() - start) * 1000:.0f} ms")
+            return True
+
+    def _run(self):
+        # La carga inicial también corre en este hilo: mientras tanto (o si falla) la validación de empleados responde 503
+        delay = 0
+        while not self._stop.wait(delay):
+            delay = self.reload_seconds
+            try:
+                self.reload()
+            except Exception as e:
+                self.errors += 1
+                pending = " - sin nómina cargada, no se autorizan empleados" if self._snapshot is None else ""
+                logger.error(f"Error recargando la nómina desde {self.source}{pending}: {e}")
+
+    def start(self):
+        if self._thread is not None or not self.is_configured:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="employee-roster-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "source": snapshot.source if snapshot is not None else None,
+            "version": snapshot.version if snapshot is not None else None,
+            "employees": len(snapshot.employees) if snapshot is not None else 0,
+            "loaded_at": snapshot.loaded_at if snapshot is not None else None,
+            "ready": self.ready,
+            "using_fallback": not self.is_configured,
+            "last_check": self.last_check,
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
+
+
+employee_roster = EmployeeRosterLoader()
+
+
+def start_employee_roster(fallback=None):
+    """:param fallback: Empleados a usar si no hay fuente de nómina configurada (MOCK_EMPLEADOS de UserAdapter)"""
+    if employee_roster.is_configured:
+        employee_roster.start()
+    else:
+        if fallback is not None:
+            employee_roster.set_fallback(fallback)
+        logger.info("Nómina de empleados sin fuente configurada (EMPLOYEE_ROSTER_SOURCE) - se usa MOCK_EMPLEADOS")
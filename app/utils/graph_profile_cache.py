@@ -0,0 +1,60 @@
+# Este código guarda en memoria los perfiles de Microsoft Graph (/me) ya consultados, indexados por el SHA-256 del access token
+# de MSAL. Si el frontend reintenta /msal o varias pestañas inician sesión con el mismo token, el perfil se sirve desde la caché
+# en lugar de repetir la llamada a Graph. Cada entrada vive hasta la expiración del propio token (claim "exp", leído sin verificar
+# porque solo se usa para acotar la vida de la entrada), la caché tiene tamaño máximo con desalojo LRU y los tokens que Graph
+# rechazó se recuerdan por un tiempo corto (caché negativa) para no volver a consultarlos.
+
+import hashlib
+import logging
+import os
+import time
+from jose import jwt, JWTError
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+GRAPH_CACHE_MAX_SIZE = int(os.getenv("GRAPH_CACHE_MAX_SIZE", "5000"))
+GRAPH_CACHE_DEFAULT_TTL = int(os.getenv("GRAPH_CACHE_DEFAULT_TTL", "300"))  # Tokens opacos sin "exp" legible
+GRAPH_CACHE_NEGATIVE_TTL = int(os.getenv("GRAPH_CACHE_NEGATIVE_TTL", "60"))
+
+REJECTED = False  # Valor guardado para tokens rechazados por Graph
+
+
+class GraphProfileCache:
+    def __init__(self, max_size: int = GRAPH_CACHE_MAX_SIZE, default_ttl: int = GRAPH_CACHE_DEFAULT_TTL,
+                 negative_ttl: int = GRAPH_CACHE_NEGATIVE_TTL):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(max_size=max_size)
+
+    @staticmethod
+    def _key(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+    def _token_expiry(self, access_token: str) -> float:
+        try:
+            exp = jwt.get_unverified_claims(access_token).get("exp")
+            if isinstance(exp, (int, float)):
+                return float(exp)
+        except JWTError:
+            pass
+        return time.time() + self.default_ttl
+
+    def get(self, access_token: str):
+        """Perfil cacheado, REJECTED si Graph rechazó el token, o None si no hay entrada"""
+        return self._cache.get(self._key(access_token))
+
+    def set_profile(self, access_token: str, profile: dict):
+        expires_at = self._token_expiry(access_token)
+        if expires_at > time.time():
+            self._cache.set(self._key(access_token), profile, expires_at=expires_at)
+
+    def set_rejected(self, access_token: str):
+        expires_at = min(self._token_expiry(access_token), time.time() + self.negative_ttl)
+        self._cache.set(self._key(access_token), REJECTED, expires_at=expires_at)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+graph_profile_cache = GraphProfileCache()
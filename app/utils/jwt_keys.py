@@ -0,0 +1,238 @@
+# Este código administra las llaves asimétricas (RS256 o ES256) con las que se firman los JWT internos. Cada llave se identifica
+# con un "kid" (huella RFC 7638 de su llave pública) que viaja en el encabezado del token, de modo que cualquier servicio pueda
+# elegir la llave correcta para verificarlo localmente usando el documento JWKS publicado en /.well-known/jwks.json.
+# El llavero (KeyRing) mantiene una llave activa, una llave siguiente ya publicada (para que las cachés del JWKS la conozcan antes
+# de que empiece a firmar) y las llaves retiradas que siguen publicadas mientras existan tokens vigentes firmados con ellas.
+# Una llave nueva solo empieza a firmar después de llevar publicada al menos JWKS_CACHE_SECONDS (más el stale-while-revalidate
+# con que se sirve el JWKS): antes de eso, un servicio con el documento en caché rechazaría los tokens firmados con ella.
+# Las llaves pueden cargarse desde un directorio de archivos PEM o generarse en memoria al iniciar la aplicación. Al cargar un
+# directorio, la llave activa es la más reciente escrita hace más de ese plazo y las más nuevas quedan publicadas como siguientes
+# (se activan solas cuando lo cumplen, contado desde la fecha de modificación del archivo); cada llave anterior a la activa se da
+# por retirada cuando se activó la siguiente y deja de publicarse al vencer el solapamiento desde ese momento. Un llavero cargado
+# de un directorio nunca rota a una llave generada en memoria, que ningún otro proceso conocería.
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ALGORITHMS = ("RS256", "ES256")
+JWKS_CACHE_SECONDS = int(os.getenv("JWKS_CACHE_SECONDS", "86400"))  # max-age con que se sirve /.well-known/jwks.json
+JWKS_STALE_SECONDS = 300  # stale-while-revalidate del mismo documento
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _int_to_b64url(value: int, length: int = None) -> str:
+    length = length or (value.bit_length() + 7) // 8
+    return _b64url(value.to_bytes(length, "big"))
+
+
+def generate_private_key(algorithm: str):
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    raise ValueError(f"Algoritmo no soportado para firma asimétrica: {algorithm}")
+
+
+class SigningKey:
+    __slots__ = ("kid", "algorithm", "private_pem", "public_jwk", "created_at", "published_at", "activated_at", "retire_at")
+
+    def __init__(self, private_key, algorithm: str):
+        self.algorithm = algorithm
+        self.private_pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ).decode("ascii")
+        self.public_jwk = self._build_public_jwk(private_key.public_key())
+        self.kid = self._thumbprint(self.public_jwk)
+        self.public_jwk["kid"] = self.kid
+        self.created_at = time.time()
+        self.published_at = self.created_at  # Desde cuándo aparece en el JWKS (fecha del archivo si viene de un directorio)
+        self.activated_at = None
+        self.retire_at = None  # Instante a partir del cual deja de publicarse
+
+    def _build_public_jwk(self, public_key) -> dict:
+        if self.algorithm == "RS256":
+            numbers = public_key.public_numbers()
+            return {"kty": "RSA", "n": _int_to_b64url(numbers.n), "e": _int_to_b64url(numbers.e),
+                    "alg": "RS256", "use": "sig"}
+        numbers = public_key.public_numbers()
+        return {"kty": "EC", "crv": "P-256", "x": _int_to_b64url(numbers.x, 32), "y": _int_to_b64url(numbers.y, 32),
+                "alg": "ES256", "use": "sig"}
+
+    @staticmethod
+    def _thumbprint(jwk: dict) -> str:
+        """Huella RFC 7638: SHA-256 de los miembros obligatorios en JSON canónico"""
+        required = ("e", "kty", "n") if jwk["kty"] == "RSA" else ("crv", "kty", "x", "y")
+        canonical = json.dumps({k: jwk[k] for k in required}, separators=(",", ":"), sort_keys=True)
+        return _b64url(hashlib.sha256(canonical.encode("utf-8")).digest())
+
+
+class KeyRing:
+    def __init__(self, algorithm: str, verify_overlap_seconds: int, rotation_seconds: int = 0,
+                 publish_lead_seconds: int = JWKS_CACHE_SECONDS + JWKS_STALE_SECONDS):
+        """
+        :param algorithm: RS256 o ES256
+        :param verify_overlap_seconds: Tiempo que una llave retirada sigue publicada (vida máxima de un token firmado con ella)
+        :param rotation_seconds: Cada cuánto rotar la llave activa (0 = solo rotación manual)
+        :param publish_lead_seconds: Tiempo mínimo que una llave lleva publicada antes de activarse (caché del JWKS)
+        """
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            raise ValueError(f"Algoritmo no soportado para firma asimétrica: {algorithm}")
+        self.algorithm = algorithm
+        self.verify_overlap_seconds = verify_overlap_seconds
+        self.rotation_seconds = rotation_seconds
+        self.publish_lead_seconds = publish_lead_seconds
+        self.from_directory = False
+        self._keys = {}
+        self._active = None
+        self._next = None
+        self._jwks_json = b'{"keys":[]}'
+        self._lock = threading.Lock()
+
+    def load_from_dir(self, path: str):
+        """
+        Carga llaves PEM de un directorio: firma la más reciente que ya lleva publicada publish_lead_seconds (contados desde
+        la fecha de modificación del archivo); las más nuevas se publican como siguientes y las anteriores solo para verificar.
+        Una llave anterior se considera retirada cuando se activó la siguiente y se publica durante el solapamiento a partir de
+        ese momento, como si se hubiera rotado en memoria.
+        """
+        files = sorted(
+            (os.path.getmtime(os.path.join(path, name)), os.path.join(path, name))
+            for name in os.listdir(path) if name.endswith(".pem")
+        )
+        if not files:
+            raise ValueError(f"No se encontraron llaves PEM en {path}")
+
+        now = time.time()
+        keys = []
+        for written_at, file_path in files:
+            with open(file_path, "rb") as file:
+                private_key = serialization.load_pem_private_key(file.read(), password=None)
+            key = SigningKey(private_key, self.algorithm)
+            key.published_at = written_at  # Las llaves del directorio se despliegan (y publican) al escribirse
+            keys.append(key)
+        # Sin ninguna llave publicada el tiempo suficiente (primer despliegue) firma la más antigua: no hay otra
+        ready = [position for position, key in enumerate(keys) if self._publish_ready(key, now)]
+        active = ready[-1] if ready else 0
+        for key, successor in zip(keys[:active], keys[1:active + 1]):
+            key.retire_at = successor.published_at + self.publish_lead_seconds + self.verify_overlap_seconds
+
+        with self._lock:
+            self.from_directory = True
+            for key in keys:
+                self._keys[key.kid] = key
+            self._active = keys[active]
+            self._active.retire_at = None
+            self._active.activated_at = now
+            self._next = keys[active + 1] if active + 1 < len(keys) else None
+            self._prune(now)
+            self._rebuild_jwks()
+            published = len(self._keys)
+        upcoming = f" - siguiente: {self._next.kid}" if self._next is not None else ""
+        logger.info(f"🔐 {len(keys)} llaves {self.algorithm} cargadas desde {path} ({published} publicadas) - "
+                    f"activa: {self._active.kid}{upcoming}")
+
+    def generate(self):
+        """Genera en memoria una llave activa y la siguiente (pre-publicada)"""
+        with self._lock:
+            self._active = self._new_key()
+            self._active.activated_at = time.time()
+            self._next = self._new_key()
+            self._rebuild_jwks()
+        logger.warning(f"⚠️ Llaves {self.algorithm} efímeras generadas en memoria - activa: {self._active.kid}")
+
+    def _new_key(self) -> SigningKey:
+        key = SigningKey(generate_private_key(self.algorithm), self.algorithm)
+        self._keys[key.kid] = key
+        return key
+
+    def _publish_ready(self, key: SigningKey, now: float) -> bool:
+        return key.published_at + self.publish_lead_seconds <= now
+
+    def _pending_after(self, key: SigningKey) -> SigningKey:
+        """La llave de directorio publicada más antigua posterior a key (None si no hay)"""
+        pending = [other for other in self._keys.values()
+                   if other.retire_at is None and other is not key and other.published_at >= key.published_at]
+        return min(pending, key=lambda other: other.published_at) if pending else None
+
+    def rotate(self, expected_kid: str = None) -> bool:
+        """
+        Retira la llave activa (sigue publicada durante el solapamiento) y promueve la siguiente, si esta ya lleva publicada
+        publish_lead_seconds. :return: True si se rotó
+        """
+        with self._lock:
+            now = time.time()
+            previous = self._active
+            if expected_kid is not None and (previous is None or previous.kid != expected_kid):
+                return False  # Otro hilo ya rotó
+            upcoming = self._next
+            if upcoming is None and self.from_directory:
+                logger.warning("⚠️ Rotación omitida: no hay una llave siguiente en el directorio de llaves")
+                return False
+            if upcoming is not None and not self._publish_ready(upcoming, now):
+                wait = upcoming.published_at + self.publish_lead_seconds - now
+                logger.warning(f"⚠️ Rotación omitida: la llave siguiente {upcoming.kid} aún no cumple el tiempo de "
+                               f"publicación del JWKS (faltan {wait:.0f} s)")
+                return False
+            if previous is not None:
+                previous.retire_at = now + self.verify_overlap_seconds
+            self._active = upcoming or self._new_key()  # Sin siguiente solo en un llavero sin llaves (generado)
+            self._active.activated_at = now
+            self._next = self._pending_after(self._active) if self.from_directory else self._new_key()
+            self._prune(now)
+            self._rebuild_jwks()
+        logger.info(f"🔄 Llave de firma rotada: {previous.kid if previous else None} -> {self._active.kid}")
+        return True
+
+    def _rotation_due(self, active: SigningKey, now: float) -> bool:
+        upcoming = self._next
+        if upcoming is None or not self._publish_ready(upcoming, now):
+            return False
+        # Una llave nueva escrita en el directorio se activa en cuanto cumple el tiempo de publicación
+        if self.from_directory:
+            return True
+        return bool(self.rotation_seconds) and active.activated_at + self.rotation_seconds <= now
+
+    def _prune(self, now: float):
+        for kid in [kid for kid, key in self._keys.items() if key.retire_at is not None and key.retire_at <= now]:
+            del self._keys[kid]
+
+    def _rebuild_jwks(self):
+        self._jwks_json = json.dumps({"keys": [key.public_jwk for key in self._keys.values()]},
+                                     separators=(",", ":")).encode("utf-8")
+
+    def active_key(self) -> SigningKey:
+        active = self._active
+        if active is None:
+            raise RuntimeError("No hay llave de firma activa")
+        if self._rotation_due(active, time.time()):
+            self.rotate(expected_kid=active.kid)
+            active = self._active
+        return active
+
+    def get_key(self, kid: str) -> SigningKey:
+        key = self._keys.get(kid)
+        if key is None or (key.retire_at is not None and key.retire_at <= time.time()):
+            return None
+        return key
+
+    def jwks_json(self) -> bytes:
+        """Documento JWKS serializado, listo para servirse desde memoria"""
+        with self._lock:
+            if any(key.retire_at is not None and key.retire_at <= time.time() for key in self._keys.values()):
+                self._prune(time.time())
+                self._rebuild_jwks()
+            return self._jwks_json
@@ -0,0 +1,634 @@
+# Este código administra las conexiones LDAP hacia Active Directory con pools reutilizables, en lugar de crear un Server y una
+# Connection nuevos (con su conexión TCP y, en algunos casos, la descarga completa del esquema con get_info=ALL) en cada login.
+# Mantiene dos pools: uno de conexiones para autenticar usuarios, donde cada login hace un bind (rebind) con las credenciales del
+# usuario sobre una conexión ya abierta, y otro de conexiones "de servicio", enlazadas con una cuenta técnica y listas para
+# búsquedas. Si no se configura cuenta de servicio, las búsquedas se hacen con la misma conexión recién autenticada del usuario.
+# Cada pool tiene tamaño máximo, desaloja conexiones inactivas, verifica la salud de las conexiones antes de reutilizarlas
+# (operación "Who am I?") y descarta las que fallan. Se registran las latencias de binds y búsquedas. Con varios controladores de
+# dominio (AD_SERVERS) cada uno tiene sus propios pools y una latencia suavizada (EWMA); se usa el más rápido de los sanos, los que
+# fallan salen de rotación con un backoff exponencial y, opcionalmente, un bind lento se respalda con otro en el siguiente
+# controlador (AD_HEDGE_AFTER_MS). Los atributos encontrados se guardan en una caché por sAMAccountName (ver directory_cache):
+# el bind del usuario siempre va a AD, la búsqueda no se repite. Al devolver al pool una conexión autenticada con un usuario se
+# borra la contraseña que ldap3 guarda en la conexión, para que no quede en memoria mientras la conexión espera inactiva.
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager, ExitStack
+from ldap3 import Server, Connection, SIMPLE, NTLM, SYNC, SUBTREE, BASE
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPException
+from ldap3.utils.conv import escape_filter_chars
+from app.utils.directory_cache import DirectoryAttributeCache
+from app.utils.ldap_schema import load_server
+
+logger = logging.getLogger(__name__)
+
+AD_SERVER = os.getenv("AD_SERVER", "bancolombia.corp")
+AD_SERVERS = os.getenv("AD_SERVERS", AD_SERVER)  # Controladores de dominio separados por coma
+AD_BASE_DN = os.getenv("AD_BASE_DN", "OU=Banistmo,OU=Usuarios,DC=bancolombia,DC=corp")
+AD_DOMAIN = os.getenv("AD_DOMAIN", "bancolombia.corp")
+AD_SERVICE_USER = os.getenv("AD_SERVICE_USER")  # Cuenta técnica para búsquedas (opcional)
+AD_SERVICE_PASSWORD = os.getenv("AD_SERVICE_PASSWORD")
+AD_POOL_MAX_SIZE = int(os.getenv("AD_POOL_MAX_SIZE", "10"))
+AD_POOL_IDLE_SECONDS = int(os.getenv("AD_POOL_IDLE_SECONDS", "300"))  # AD cierra conexiones inactivas a los 900 s
+AD_POOL_HEALTH_CHECK_SECONDS = int(os.getenv("AD_POOL_HEALTH_CHECK_SECONDS", "60"))
+AD_POOL_CHECKOUT_TIMEOUT = float(os.getenv("AD_POOL_CHECKOUT_TIMEOUT", "5"))
+AD_RECEIVE_TIMEOUT = int(os.getenv("AD_RECEIVE_TIMEOUT", "5"))
+AD_CONNECT_TIMEOUT = int(os.getenv("AD_CONNECT_TIMEOUT", "5"))
+AD_EWMA_ALPHA = float(os.getenv("AD_EWMA_ALPHA", "0.3"))  # Peso de la última medición en la latencia suavizada
+AD_HEDGE_AFTER_MS = float(os.getenv("AD_HEDGE_AFTER_MS", "0"))  # 0 = sin bind de respaldo
+AD_BACKOFF_BASE_SECONDS = float(os.getenv("AD_BACKOFF_BASE_SECONDS", "5"))
+AD_BACKOFF_MAX_SECONDS = float(os.getenv("AD_BACKOFF_MAX_SECONDS", "300"))
+AD_BATCH_CHUNK_SIZE = int(os.getenv("AD_BATCH_CHUNK_SIZE", "200"))  # Cuentas por filtro OR (AD limita tamaño de filtro y página)
+
+USER_ATTRIBUTES = ["userAccountControl", "displayName", "mail"]
+TOKEN_GROUPS = "tokenGroups"  # SIDs de todos los grupos del usuario, incluidos los anidados, en una sola lectura
+ACCOUNT_DISABLED = 0x2
+
+
+class DirectoryPoolTimeout(Exception):
+    pass
+
+
+class DirectoryConfigurationError(LDAPException):
+    pass
+
+
+class LatencyStats:
+    def __init__(self, size: int = 1024):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, elapsed_ms: float):
+        with self._lock:
+            self.count += 1
+            self._samples.append(elapsed_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2) if samples else 0.0
+
+        return {"count": count, "p50_ms": percentile(0.50), "p95_ms": percentile(0.95), "max_ms": percentile(1.0)}
+
+
+class PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used", "last_checked")
+
+    def __init__(self, conn: Connection):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+
+
+class ConnectionPool:
+    def __init__(self, name: str, factory, max_size: int = AD_POOL_MAX_SIZE, idle_seconds: int = AD_POOL_IDLE_SECONDS,
+                 health_check_seconds: int = AD_POOL_HEALTH_CHECK_SECONDS,
+                 checkout_timeout: float = AD_POOL_CHECKOUT_TIMEOUT, health_check=None, reset=None):
+        """
+        :param health_check: Verificación de una conexión inactiva antes de reutilizarla
+        :param reset: Limpieza de una conexión al devolverla al pool
+        """
+        self.name = name
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.health_check_seconds = health_check_seconds
+        self.checkout_timeout = checkout_timeout
+        self.health_check = health_check
+        self.reset = reset
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self.created = 0
+        self.discarded = 0
+
+    def _evict_idle(self, now: float):
+        # Las conexiones inactivas más antiguas quedan al inicio de la cola
+        while self._idle and now - self._idle[0].last_used > self.idle_seconds:
+            self._close(self._idle.popleft())
+            self._size -= 1
+
+    def _close(self, pooled: PooledConnection):
+        try:
+            pooled.conn.unbind()
+        except Exception:
+            pass
+
+    def _acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+                if self._idle:
+                    pooled = self._idle.pop()  # LIFO: la conexión más recientemente usada está más "caliente"
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    pooled = None
+                    break
+                if not self._cond.wait(deadline - now) and time.monotonic() >= deadline:
+                    raise DirectoryPoolTimeout(f"Pool LDAP '{self.name}' agotado ({self.max_size} conexiones)")
+
+        if pooled is not None and not self._is_healthy(pooled):
+            self._close(pooled)
+            with self._cond:
+                self.discarded += 1
+            pooled = None
+
+        if pooled is None:
+            try:
+                pooled = PooledConnection(self.factory())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.created += 1
+        return pooled
+
+    def _is_healthy(self, pooled: PooledConnection) -> bool:
+        if pooled.conn.closed:
+            return False
+        now = time.monotonic()
+        if self.health_check is None or now - pooled.last_checked < self.health_check_seconds:
+            return True
+        try:
+            healthy = self.health_check(pooled.conn)
+        except LDAPException:
+            healthy = False
+        pooled.last_checked = now
+        return healthy
+
+    def _release(self, pooled: PooledConnection):
+        if self.reset is not None:
+            self.reset(pooled.conn)
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _discard(self, pooled: PooledConnection):
+        self._close(pooled)
+        with self._cond:
+            self._size -= 1
+            self.discarded += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        pooled = self._acquire()
+        try:
+            yield pooled.conn
+        except LDAPCommunicationError:
+            self._discard(pooled)
+            raise
+        except BaseException:
+            # Errores no relacionados con el socket no invalidan la conexión
+            self._release(pooled)
+            raise
+        else:
+            if pooled.conn.closed:
+                self._discard(pooled)
+            else:
+                self._release(pooled)
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                self._close(self._idle.pop())
+                self._size -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "created": self.created,
+                "discarded": self.discarded,
+            }
+
+
+class DomainController:
+    """Un controlador de dominio con sus pools de conexiones, su latencia suavizada (EWMA) y su estado de salud"""
+
+    def __init__(self, server: Server, bind_factory, service_factory=None, max_size: int = AD_POOL_MAX_SIZE,
+                 ewma_alpha: float = AD_EWMA_ALPHA, backoff_base: float = AD_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = AD_BACKOFF_MAX_SECONDS, health_check=None):
+        self.server = server
+        self.host = server.host
+        self.ewma_alpha = ewma_alpha
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bind_pool = ConnectionPool(f"bind:{self.host}", lambda: bind_factory(server), max_size=max_size,
+                                        reset=forget_credentials)
+        self.service_pool = None
+        if service_factory is not None:
+            self.service_pool = ConnectionPool(
+                f"service:{self.host}", lambda: service_factory(server), max_size=max_size, health_check=health_check
+            )
+        self._lock = threading.Lock()
+        self.ewma_ms = None  # Sin mediciones: se prefiere para conocer su latencia
+        self.failures = 0
+        self.backoff_until = 0.0
+        self.total_failures = 0
+
+    def record_latency(self, elapsed_ms: float):
+        with self._lock:
+            if self.ewma_ms is None:
+                self.ewma_ms = elapsed_ms
+            else:
+                self.ewma_ms = self.ewma_alpha * elapsed_ms + (1 - self.ewma_alpha) * self.ewma_ms
+            self.failures = 0
+            self.backoff_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            backoff = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            self.backoff_until = time.monotonic() + backoff
+        logger.warning(f"⚠️ Controlador {self.host} falló ({self.failures} seguidas) - fuera de rotación {backoff:.0f}s")
+
+    def is_healthy(self, now: float) -> bool:
+        return self.backoff_until <= now
+
+    def close(self):
+        self.bind_pool.close()
+        if self.service_pool is not None:
+            self.service_pool.close()
+
+    def stats(self) -> dict:
+        return {
+            "host": self.host,
+            "ewma_ms": round(self.ewma_ms, 2) if self.ewma_ms is not None else None,
+            "healthy": self.is_healthy(time.monotonic()),
+            "consecutive_failures": self.failures,
+            "total_failures": self.total_failures,
+            "backoff_remaining_s": round(max(0.0, self.backoff_until - time.monotonic()), 1),
+            "bind_pool": self.bind_pool.stats(),
+            "service_pool": self.service_pool.stats() if self.service_pool else None,
+        }
+
+
+class DirectoryPool:
+    def __init__(self, server_host: str = AD_SERVERS, base_dn: str = AD_BASE_DN, domain: str = AD_DOMAIN,
+                 service_user: str = AD_SERVICE_USER, service_password: str = AD_SERVICE_PASSWORD,
+                 authentication: str = SIMPLE, max_size: int = AD_POOL_MAX_SIZE, servers=None,
+                 client_strategy: str = SYNC, receive_timeout: int = AD_RECEIVE_TIMEOUT,
+                 attribute_cache: DirectoryAttributeCache = None, hedge_after_ms: float = AD_HEDGE_AFTER_MS):
+        """
+        :param server_host: Uno o varios controladores de dominio separados por coma
+        :param servers: Servers ya construidos; si no, se crean con el esquema guardado en AD_SCHEMA_DIR (o sin información)
+        :param client_strategy: SYNC en producción; MOCK_SYNC permite probar contra un directorio en memoria
+        :param attribute_cache: Caché de atributos por sAMAccountName; por defecto una propia de este pool
+        :param hedge_after_ms: Si el bind tarda más, se lanza otro en el siguiente controlador (0 = deshabilitado)
+        """
+        self.base_dn = base_dn
+        self.domain = domain
+        self.authentication = authentication
+        self.client_strategy = client_strategy
+        self.receive_timeout = receive_timeout
+        self.service_user = service_user
+        self.service_password = service_password
+        self.attribute_cache = attribute_cache or DirectoryAttributeCache()
+        self.hedge_after_ms = hedge_after_ms
+
+        if servers is None:
+            hosts = [host.strip() for host in server_host.split(",") if host.strip()]
+            servers = [load_server(host, connect_timeout=AD_CONNECT_TIMEOUT) for host in hosts]
+        has_service = bool(service_user and service_password)
+        self.controllers = [
+            DomainController(server, self._open_connection, self._open_service_connection if has_service else None,
+                             max_size=max_size, health_check=self._who_am_i)
+            for server in servers
+        ]
+
+        self.bind_latency = LatencyStats()
+        self.search_latency = LatencyStats()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._hedge_executor = None
+        if hedge_after_ms and len(self.controllers) > 1:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=max_size * 2, thread_name_prefix="ldap-hedge")
+
+    def _open_connection(self, server: Server) -> Connection:
+        conn = Connection(server, client_strategy=self.client_strategy, receive_timeout=self.receive_timeout,
+                          raise_exceptions=False)
+        conn.open(read_server_info=False)
+        return conn
+
+    def _open_service_connection(self, server: Server) -> Connection:
+        conn = self._open_connection(server)
+        start = time.perf_counter()
+        bound = conn.rebind(user=self.service_user, password=self.service_password, read_server_info=False)
+        self.bind_latency.record((time.perf_counter() - start) * 1000)
+        if not bound:
+            conn.unbind()
+            raise LDAPException(f"Bind de la cuenta de servicio fallido: {conn.result}")
+        return conn
+
+    @staticmethod
+    def _who_am_i(conn: Connection) -> bool:
+        return conn.extend.standard.who_am_i() is not None
+
+    def _candidates(self, service: bool = False) -> list:
+        """Controladores en orden de preferencia: sanos por menor latencia, luego en backoff por el que sale antes"""
+        now = time.monotonic()
+        controllers = [dc for dc in self.controllers if not service or dc.service_pool is not None]
+        healthy = sorted((dc for dc in controllers if dc.is_healthy(now)),
+                         key=lambda dc: dc.ewma_ms if dc.ewma_ms is not None else 0.0)
+        unhealthy = sorted((dc for dc in controllers if not dc.is_healthy(now)), key=lambda dc: dc.backoff_until)
+        candidates = healthy + unhealthy
+        if not candidates:
+            raise DirectoryConfigurationError("No hay controladores de dominio configurados (AD_SERVERS)")
+        # Con un solo controlador, un segundo intento cubre conexiones cerradas por el servidor mientras estaban en el pool
+        return candidates if len(candidates) > 1 else candidates * 2
+
+    def bind_user(self, username: str) -> str:
+        if self.authentication == NTLM:
+            return f"{self.domain}\\{username}"
+        return f"{username}@{self.domain}"
+
+    def _bind(self, dc: DomainController, conn: Connection, username: str, password: str) -> bool:
+        start = time.perf_counter()
+        bound = conn.rebind(user=self.bind_user(username), password=password, authentication=self.authentication,
+                            read_server_info=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.bind_latency.record(elapsed_ms)
+        dc.record_latency(elapsed_ms)
+        return bound
+
+    def _search(self, dc: DomainController, conn: Connection, username: str, attributes) -> dict:
+        start = time.perf_counter()
+        # tokenGroups es un atributo construido: AD solo lo devuelve en búsquedas de alcance BASE sobre el DN
+        token_groups = TOKEN_GROUPS in attributes
+        conn.search(self.base_dn, f"(sAMAccountName={escape_filter_chars(username)})", search_scope=SUBTREE,
+                    attributes=[name for name in attributes if name != TOKEN_GROUPS])
+        result = None
+        for entry in conn.response or []:
+            if entry.get("type") == "searchResEntry":
+                result = dict(entry["attributes"], dn=entry["dn"])
+                break
+
+        if result is not None and token_groups:
+            conn.search(result["dn"], "(objectClass=*)", search_scope=BASE, attributes=[TOKEN_GROUPS])
+            result[TOKEN_GROUPS] = []
+            for entry in conn.response or []:
+                if entry.get("type") == "searchResEntry":
+                    # Valores binarios tal como los envía AD: sin esquema ldap3 podría decodificarlos como texto
+                    result[TOKEN_GROUPS] = entry.get("raw_attributes", {}).get(TOKEN_GROUPS) or []
+                    break
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.search_latency.record(elapsed_ms)
+        dc.record_latency(elapsed_ms)
+        return result
+
+    def _authenticate_on(self, dc: DomainController, username: str, password: str, attributes, fresh: bool = False):
+        try:
+            with dc.bind_pool.connection() as conn:
+                if not self._bind(dc, conn, username, password):
+                    return False, None
+                if attributes is None:
+                    return True, None
+                cached = None if fresh else self.attribute_cache.get(username, attributes)
+                if cached is not None:
+                    return True, cached or None
+                if dc.service_pool is None:
+                    return True, self._remember(username, self._search(dc, conn, username, attributes))
+            with dc.service_pool.connection() as conn:
+                return True, self._remember(username, self._search(dc, conn, username, attributes))
+        except LDAPCommunicationError:
+            dc.record_failure()
+            raise
+
+    def _hedged(self, primary: DomainController, secondary: DomainController, username: str, password: str,
+                attributes, fresh: bool = False):
+        # El bind de respaldo cuenta como un intento más frente a la política de bloqueo si la contraseña es incorrecta:
+        # por eso solo se lanza cuando el primero supera el umbral, no en paralelo desde el inicio
+        first = self._hedge_executor.submit(self._authenticate_on, primary, username, password, attributes, fresh)
+        try:
+            return first.result(timeout=self.hedge_after_ms / 1000)
+        except FuturesTimeoutError:
+            pass
+        except LDAPCommunicationError:
+            return self._authenticate_on(secondary, username, password, attributes, fresh)
+
+        self.hedged += 1
+        logger.info(f"🏁 Bind en {primary.host} supera {self.hedge_after_ms} ms - lanzando respaldo en {secondary.host}")
+        second = self._hedge_executor.submit(self._authenticate_on, secondary, username, password, attributes, fresh)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except LDAPCommunicationError as e:
+                    error = e
+                    continue
+                if future is second:
+                    self.hedge_wins += 1
+                return result
+        raise error
+
+    def authenticate(self, username: str, password: str, attributes=None, fresh: bool = False):
+        """
+        Valida las credenciales del usuario con un bind sobre una conexión del pool del controlador más rápido.
+        :param fresh: Lee los atributos del directorio aunque estén en la caché de atributos (y la actualiza)
+        :return: (autenticado, atributos) - atributos es None si no se pidieron o el usuario no se encontró
+        """
+        if not username or not password:
+            # Un bind simple con contraseña vacía es "no autenticado" y AD lo acepta: se rechaza aquí
+            return False, None
+
+        candidates = self._candidates()
+        if self._hedge_executor is not None and candidates[0] is not candidates[1]:
+            return self._hedged(candidates[0], candidates[1], username, password, attributes, fresh)
+
+        error = None
+        for dc in candidates:
+            try:
+                return self._authenticate_on(dc, username, password, attributes, fresh)
+            except LDAPCommunicationError as e:
+                # Controlador caído o conexión cerrada por el servidor: se intenta con el siguiente
+                error = e
+        raise error
+
+    def _remember(self, username: str, entry: dict) -> dict:
+        if entry is None:
+            self.attribute_cache.set_not_found(username)
+        else:
+            self.attribute_cache.set(username, entry, disabled=is_account_disabled(entry))
+        return entry
+
+    @property
+    def has_service_account(self) -> bool:
+        return bool(self.service_user and self.service_password)
+
+    @contextmanager
+    def service_connection(self, prefer_host: str = None):
+        """
+        Context manager con una conexión de servicio del controlador más rápido (para búsquedas masivas).
+        :param prefer_host: Controlador a usar mientras esté sano, aunque otro sea más rápido
+        """
+        if not self.has_service_account:
+            raise DirectoryConfigurationError("Búsquedas sin credenciales requieren AD_SERVICE_USER / AD_SERVICE_PASSWORD")
+        candidates = self._candidates(service=True)
+        if prefer_host is not None:
+            now = time.monotonic()
+            candidates.sort(key=lambda dc: not (dc.host == prefer_host and dc.is_healthy(now)))
+        error = None
+        for dc in candidates:
+            stack = ExitStack()
+            try:
+                conn = stack.enter_context(dc.service_pool.connection())
+            except LDAPCommunicationError as e:
+                dc.record_failure()
+                error = e
+                continue
+            with stack:
+                yield conn
+            return
+        raise error
+
+    def search_user(self, username: str, attributes=None) -> dict:
+        """Busca los atributos de un usuario con la conexión de servicio (sin credenciales del usuario)"""
+        attributes = attributes or USER_ATTRIBUTES
+        cached = self.attribute_cache.get(username, attributes)
+        if cached is not None:
+            return cached or None
+        if not self.has_service_account:
+            raise DirectoryConfigurationError("Búsquedas sin credenciales requieren AD_SERVICE_USER / AD_SERVICE_PASSWORD")
+
+        error = None
+        for dc in self._candidates(service=True):
+            try:
+                with dc.service_pool.connection() as conn:
+                    return self._remember(username, self._search(dc, conn, username, attributes))
+            except LDAPCommunicationError as e:
+                dc.record_failure()
+                error = e
+        raise error
+
+    def search_users(self, usernames, attributes=None, chunk_size: int = AD_BATCH_CHUNK_SIZE) -> dict:
+        """
+        Busca varios usuarios con filtros OR de hasta chunk_size cuentas por búsqueda, en lugar de una búsqueda por usuario.
+        :return: {sAMAccountName en minúsculas: atributos o None si no existe}
+        """
+        attributes = attributes or USER_ATTRIBUTES
+        results = {}
+        pending = []
+        for username in dict.fromkeys(u.lower() for u in usernames if u):
+            cached = self.attribute_cache.get(username, attributes)
+            if cached is None:
+                pending.append(username)
+            else:
+                results[username] = cached or None
+        if not pending:
+            return results
+
+        with self.service_connection() as conn:
+            for i in range(0, len(pending), chunk_size):
+                chunk = pending[i:i + chunk_size]
+                search_filter = "(|" + "".join(f"(sAMAccountName={escape_filter_chars(u)})" for u in chunk) + ")"
+                start = time.perf_counter()
+                entries = conn.extend.standard.paged_search(
+                    self.base_dn, search_filter, search_scope=SUBTREE,
+                    attributes=list(dict.fromkeys(attributes + ["sAMAccountName"])), paged_size=chunk_size,
+                    generator=False
+                )
+                self.search_latency.record((time.perf_counter() - start) * 1000)
+                found = {}
+                for entry in entries or []:
+                    if entry.get("type") == "searchResEntry":
+                        name = first_value(entry["attributes"], "sAMAccountName")
+                        if name:
+                            found[name.lower()] = dict(entry["attributes"], dn=entry["dn"])
+                for username in chunk:
+                    results[username] = self._remember(username, found.get(username))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "controllers": [dc.stats() for dc in self.controllers],
+            "bind_latency": self.bind_latency.snapshot(),
+            "search_latency": self.search_latency.snapshot(),
+            "hedged_binds": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "attribute_cache": self.attribute_cache.stats(),
+        }
+
+    def close(self):
+        for dc in self.controllers:
+            dc.close()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+
+
+def forget_credentials(conn: Connection):
+    # ldap3 conserva en la conexión la contraseña del último bind; la siguiente autenticación hace su propio rebind
+    conn.password = None
+
+
+def is_account_disabled(attributes: dict) -> bool:
+    value = attributes.get("userAccountControl") or 0
+    if isinstance(value, list):
+        value = value[0] if value else 0
+    return bool(int(value) & ACCOUNT_DISABLED)
+
+
+def first_value(attributes: dict, name: str):
+    value = attributes.get(name)
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_directory_pool(server_host: str = AD_SERVERS, base_dn: str = AD_BASE_DN, domain: str = AD_DOMAIN,
+                       authentication: str = SIMPLE) -> DirectoryPool:
+    """Pool compartido por combinación de servidor, base DN, dominio y método de autenticación"""
+    key = (server_host.lower(), base_dn.lower(), domain.lower(), authentication)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = DirectoryPool(server_host, base_dn, domain, authentication=authentication)
+            _pools[key] = pool
+        return pool
+
+
+def invalidate_directory_user(username: str) -> bool:
+    """Elimina los atributos cacheados del usuario en todos los pools (p. ej. tras deshabilitarlo en AD)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    removed = False
+    for pool in pools:
+        removed = pool.attribute_cache.invalidate(username) or removed
+    return removed
+
+
+def clear_directory_caches():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.attribute_cache.clear()
+
+
+directory_pool = get_directory_pool()
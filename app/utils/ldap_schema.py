@@ -0,0 +1,63 @@
+# Este código guarda en archivos JSON la información del servidor de Active Directory (root DSE) y su esquema, para no descargarlos
+# en cada conexión. Con get_info=ALL ldap3 lee el root DSE y el esquema completo cada vez que abre una conexión; sin esa información
+# los atributos llegan como texto sin tipo. La captura se hace una sola vez, como paso fuera de línea:
+#     python -m app.utils.ldap_schema
+# (usa AD_SERVER y la cuenta de servicio AD_SERVICE_USER / AD_SERVICE_PASSWORD) y deja los archivos en AD_SCHEMA_DIR. Al arrancar,
+# load_server construye el Server con Server.from_definition a partir de esos archivos: las conexiones ya no intercambian esta
+# información pero los atributos se siguen decodificando con su tipo (enteros, fechas, valores únicos). Si los archivos no existen
+# se usa un Server sin información (get_info=NONE), como hasta ahora.
+
+import logging
+import os
+from ldap3 import Server, Connection, ALL, NONE, DsaInfo, SchemaInfo
+
+logger = logging.getLogger(__name__)
+
+AD_SCHEMA_DIR = os.getenv("AD_SCHEMA_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "ldap_schema"))
+SERVER_INFO_FILE = "server_info.json"
+SERVER_SCHEMA_FILE = "server_schema.json"
+
+
+def _paths(directory: str):
+    return os.path.join(directory, SERVER_INFO_FILE), os.path.join(directory, SERVER_SCHEMA_FILE)
+
+
+def capture_server_definition(host: str, user: str, password: str, directory: str = AD_SCHEMA_DIR,
+                              connect_timeout: int = 10):
+    """Descarga root DSE y esquema del servidor y los guarda como JSON en directory"""
+    server = Server(host, get_info=ALL, connect_timeout=connect_timeout)
+    conn = Connection(server, user=user, password=password, auto_bind=True)
+    try:
+        if server.info is None or server.schema is None:
+            raise RuntimeError(f"El servidor {host} no devolvió root DSE o esquema")
+        os.makedirs(directory, exist_ok=True)
+        info_path, schema_path = _paths(directory)
+        server.info.to_file(info_path)
+        server.schema.to_file(schema_path)
+        logger.info(f"💾 Información y esquema de {host} guardados en {directory}")
+        return info_path, schema_path
+    finally:
+        conn.unbind()
+
+
+def load_server(host: str, directory: str = AD_SCHEMA_DIR, connect_timeout: int = 5) -> Server:
+    """Server con la información y el esquema guardados, o sin información si no hay captura previa"""
+    info_path, schema_path = _paths(directory)
+    if os.path.isfile(info_path) and os.path.isfile(schema_path):
+        try:
+            server = Server.from_definition(host, DsaInfo.from_file(info_path), SchemaInfo.from_file(schema_path))
+            server.connect_timeout = connect_timeout  # from_definition no acepta el parámetro
+            logger.info(f"📂 Esquema de AD cargado desde {directory}")
+            return server
+        except Exception as e:
+            logger.error(f"Error cargando el esquema de AD desde {directory}: {e}")
+    return Server(host, get_info=NONE, connect_timeout=connect_timeout)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    service_user = os.getenv("AD_SERVICE_USER")
+    service_password = os.getenv("AD_SERVICE_PASSWORD")
+    if not service_user or not service_password:
+        raise SystemExit("Se requieren AD_SERVICE_USER y AD_SERVICE_PASSWORD para capturar el esquema")
+    capture_server_definition(os.getenv("AD_SERVER", "bancolombia.corp"), service_user, service_password)
@@ -0,0 +1,182 @@
+# Este código busca empleados por similitud de nombre, sin importar tildes ni mayúsculas: "Jose Pena" encuentra a "José Peña".
+# Los nombres se normalizan con Unicode NFKD (la "é" se separa en "e" + tilde combinante), se eliminan las marcas combinantes, se
+# pasan a minúsculas con casefold y se colapsan los espacios. Cada palabra se rellena con un espacio a cada lado y se divide en
+# trigramas (al construir el índice, cada palabra distinta de la nómina se normaliza una sola vez). La similitud es el coeficiente
+# de Dice entre los conjuntos de trigramas: 2 * comunes / (trigramas de la consulta + trigramas del nombre), así que un nombre de
+# s trigramas supera el umbral t si comparte al menos t * (|q| + s) / 2 con la consulta.
+# Para no recorrer candidato por candidato, cada trigrama guarda sus posiciones de la nómina como un entero usado de bitset (los
+# trigramas poco frecuentes se guardan como array y se convierten al consultar). La búsqueda suma los bitsets de los trigramas de la consulta
+# en un contador "por rebanadas de bits" (un bitset por bit del conteo, sumado con XOR/AND como un sumador binario), de modo que
+# cada operación procesa toda la nómina a la vez. El conteo es exacto, así que la similitud de una posición depende solo del par
+# (trigramas comunes, tamaño del nombre): los pares se recorren de mayor a menor similitud y cada uno se resuelve con un AND entre
+# el bitset de "conteo igual a c" y el de los nombres de ese tamaño. La búsqueda se detiene al reunir k posiciones, sin puntuar
+# candidato por candidato en Python aunque miles de nombres compartan apellidos con la consulta. Al final hay un benchmark con una
+# nómina sintética de 100k empleados con nombres y apellidos repetidos.
+
+import os
+import re
+import unicodedata
+from array import array
+
+EMPLOYEE_NAME_SIMILARITY = float(os.getenv("EMPLOYEE_NAME_SIMILARITY", "0.6"))  # Umbral de Dice (0 a 1)
+EMPLOYEE_NAME_TOP_K = int(os.getenv("EMPLOYEE_NAME_TOP_K", "5"))
+# Si ninguna regla exacta autoriza al usuario MSAL, se acepta al empleado más parecido solo si está activado, el correo es
+# corporativo, la similitud alcanza EMPLOYEE_NAME_FUZZY_AUTH_SIMILARITY y ningún otro empleado empata con él
+EMPLOYEE_NAME_FUZZY_FALLBACK = os.getenv("EMPLOYEE_NAME_FUZZY_FALLBACK", "false").lower() == "true"
+EMPLOYEE_NAME_FUZZY_AUTH_SIMILARITY = float(os.getenv("EMPLOYEE_NAME_FUZZY_AUTH_SIMILARITY", "0.9"))
+
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def normalize_name(text: str) -> str:
+    """Minúsculas, sin tildes ni diacríticos y con un solo espacio entre palabras"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def name_trigrams(normalized: str) -> set:
+    grams = set()
+    for word in normalized.split(" "):
+        if word:
+            padded = f" {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _to_bitset(positions, size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _bitset_positions(bitset: int, size: int, limit: int = None) -> list:
+    """Posiciones encendidas en orden ascendente (a lo sumo limit)"""
+    data = bitset.to_bytes((size + 7) // 8, "little")
+    positions = []
+    for match in NONZERO_BYTE.finditer(data):
+        byte, base = match.group()[0], match.start() * 8
+        while byte:
+            low = byte & -byte
+            positions.append(base + low.bit_length() - 1)
+            if limit is not None and len(positions) >= limit:
+                return positions
+            byte ^= low
+    return positions
+
+
+def _equal_to(counter: list, count: int) -> int:
+    """Bitset (con bits de más allá de la nómina; se limpian con AND) de las posiciones cuyo conteo es exactamente count"""
+    equal = -1
+    for bit, plane in enumerate(counter):
+        equal &= plane if (count >> bit) & 1 else ~plane
+    return equal
+
+
+class NameTrigramIndex:
+    def __init__(self, names):
+        postings = {}
+        sizes = array("H")
+        word_grams = {}  # Las palabras se repiten mucho en una nómina: cada una se normaliza una sola vez
+        for position, name in enumerate(names):
+            grams = set()
+            for word in (name or "").split():
+                cached = word_grams.get(word)
+                if cached is None:
+                    cached = word_grams[word] = name_trigrams(normalize_name(word))
+                grams |= cached
+            sizes.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                gram_postings = postings.get(gram)
+                if gram_postings is None:
+                    gram_postings = postings[gram] = array("I")
+                gram_postings.append(position)
+
+        self._size = len(sizes)
+        # Un bitset ocupa size/8 bytes y un array 4 bytes por posición. Convertir un array al consultar cuesta en proporción a
+        # su largo, así que se guarda como bitset todo trigrama presente en más de 1/256 de la nómina (a lo sumo 8 veces lo
+        # que ocuparía como array); los raros se convierten al consultar, lo que es barato por ser cortos
+        dense = max(1, self._size // 256)
+        self._postings = {gram: _to_bitset(positions, self._size) if len(positions) >= dense else positions
+                          for gram, positions in postings.items()}
+        by_size = {}
+        for position, gram_count in enumerate(sizes):
+            by_size.setdefault(gram_count, array("I")).append(position)
+        self._size_masks = {gram_count: _to_bitset(positions, self._size) for gram_count, positions in by_size.items()}
+
+    def __len__(self):
+        return self._size
+
+    def search(self, query: str, k: int = EMPLOYEE_NAME_TOP_K, threshold: float = EMPLOYEE_NAME_SIMILARITY) -> list:
+        """
+        Nombres más parecidos a query (con al menos un trigrama en común).
+        :return: [(similitud, posición)] de mayor a menor similitud (a igual similitud, primero el de menor posición)
+        """
+        grams = name_trigrams(normalize_name(query))
+        if not grams or k <= 0 or not self._size:
+            return []
+
+        # Trigramas comunes por posición, en rebanadas de bits
+        counter = [0] * len(grams).bit_length()
+        for gram in grams:
+            carry = self._postings.get(gram, 0)
+            if not isinstance(carry, int):
+                carry = _to_bitset(carry, self._size)
+            for bit in range(len(counter)):
+                if not carry:
+                    break
+                counter[bit], carry = counter[bit] ^ carry, counter[bit] & carry
+
+        # Pares (comunes, tamaño) que superan el umbral, agrupados por similitud. Cocientes iguales dan el mismo float (la
+        # división es exacta hasta el redondeo), así que los empates quedan en el mismo grupo
+        pairs_by_score = {}
+        for gram_count in self._size_masks:
+            for overlap in range(1, min(len(grams), gram_count) + 1):
+                score = 2 * overlap / (len(grams) + gram_count)
+                if score >= threshold:
+                    pairs_by_score.setdefault(score, []).append((overlap, gram_count))
+
+        found = []
+        equal_masks = {}
+        for score in sorted(pairs_by_score, reverse=True):
+            matched = 0
+            for overlap, gram_count in pairs_by_score[score]:
+                equal = equal_masks.get(overlap)
+                if equal is None:
+                    equal = equal_masks[overlap] = _equal_to(counter, overlap)
+                matched |= equal & self._size_masks[gram_count]
+            if matched:
+                # A igual similitud, primero las posiciones menores
+                found.extend((score, position) for position in _bitset_positions(matched, self._size, k - len(found)))
+                if len(found) >= k:
+                    break
+        return found
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(11)
+    nombres = ["Luis", "María", "José", "Carmen", "Roberto", "Ana", "Pedro", "Sofía", "Juan", "Elena", "Carlos", "Isabel",
+               "Miguel", "Patricia", "Jorge", "Lucía", "Andrés", "Valeria", "Diego", "Camila", "Ricardo", "Gabriela"]
+    # Apellidos repetidos, como en una nómina real: una consulta comparte trigramas con miles de nombres
+    apellidos = ["Reyes", "Pinilla", "Rodríguez", "Santos", "Méndez", "Vargas", "González", "López", "Herrera", "Díaz",
+                 "Morales", "Cruz", "Castillo", "Ruiz", "Vega", "Peña", "Batista", "Quintero", "Sánchez", "Ortega"]
+
+    names = [f"{random.choice(nombres)} {random.choice(nombres)} {random.choice(apellidos)} {random.choice(apellidos)}"
+             for _ in range(100_000)]
+
+    start = time.perf_counter()
+    index = NameTrigramIndex(names)
+    print(f"Índice de trigramas construido para {len(index)} nombres en {time.perf_counter() - start:.2f} s")
+
+    queries = ["Luis Reyes", "Maria Rodriguez Santos", "Jose Pena"]
+    for _ in range(1000):
+        parts = random.choice(names).split(" ")
+        queries.append(normalize_name(f"{parts[0]} {parts[2]} {parts[3]}"))  # sin tildes y sin segundo nombre
+    start = time.perf_counter()
+    found = sum(1 for query in queries if index.search(query, k=1))
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"Búsqueda top-1 (umbral {EMPLOYEE_NAME_SIMILARITY}): {elapsed_ms:.3f} ms/consulta, {found}/{len(queries)} encontrados")
@@ -0,0 +1,131 @@
+# Este código implementa el patrón "single-flight": cuando varias peticiones piden al mismo tiempo la misma validación de identidad
+# (mismo token MSAL, mismo usuario y contraseña de Active Directory), solo la primera ejecuta la llamada real a Graph o LDAP y las
+# demás esperan y reciben su mismo resultado (o su misma excepción). El resultado no se guarda: en cuanto la llamada termina, la
+# siguiente petición vuelve a ejecutarla. Funciona tanto desde rutas síncronas (threadpool de FastAPI) como desde rutas async: la
+# llamada en curso se representa con un concurrent.futures.Future, que los hilos esperan con result() y las corrutinas con
+# asyncio.wrap_future, de modo que ambos tipos de ruta comparten la misma llamada. Cada grupo lleva métricas de llamadas coalescidas.
+# El Future se marca "en ejecución" al crearlo: si se cancela un seguidor (el cliente se desconectó), wrap_future intenta cancelar
+# el Future compartido y no puede, así que el líder y los demás seguidores no se enteran. Si se cancela el líder, la key se libera
+# y los seguidores reintentan (uno de ellos pasa a ser el nuevo líder) en lugar de recibir la cancelación ajena.
+
+import asyncio
+import hashlib
+import inspect
+import logging
+import threading
+from concurrent.futures import Future
+from functools import partial
+import anyio
+
+logger = logging.getLogger(__name__)
+
+_groups = {}
+
+
+class _LeaderCancelled(Exception):
+    """El líder se canceló antes de terminar: los seguidores vuelven a intentar"""
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}  # key -> Future de la llamada en curso
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        _groups[name] = self
+
+    def _join(self, key):
+        with self._lock:
+            self.calls += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()  # Ya no se puede cancelar desde un seguidor
+            self._calls[key] = future
+            self.executions += 1
+            return future, True
+
+    def _finish(self, key, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) o se une a la ejecución en curso con la misma key"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            logger.debug(f"🔗 [{self.name}] llamada coalescida")
+            try:
+                return future.result()
+            except _LeaderCancelled:
+                continue
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, error=_LeaderCancelled())
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Variante para rutas async; fn puede ser una corrutina o una función bloqueante (se ejecuta en un hilo)"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            logger.debug(f"🔗 [{self.name}] llamada coalescida")
+            try:
+                return await asyncio.wrap_future(future)
+            except _LeaderCancelled:
+                continue
+
+        try:
+            if inspect.iscoroutinefunction(fn):
+                result = await fn(*args, **kwargs)
+            else:
+                result = await anyio.to_thread.run_sync(partial(fn, *args, **kwargs))
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Cancelación del líder (cliente desconectado): no se propaga a los seguidores, que reintentan
+            self._finish(key, future, error=_LeaderCancelled())
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+def flight_key(*parts: str) -> str:
+    """Key de coalescencia; se usa un digest para no conservar secretos (tokens, contraseñas) en claro"""
+    return hashlib.sha256("\x00".join(p or "" for p in parts).encode("utf-8")).hexdigest()
+
+
+def single_flight_stats() -> dict:
+    return {name: group.stats() for name, group in _groups.items()}
+
+
+# Grupos compartidos por las validaciones de identidad
+msal_flight = SingleFlight("msal")
+directory_flight = SingleFlight("directory")
@@ -2,17 +2,66 @@
 # una clave secreta y el algoritmo HS256 para firmar los tokens. La función create_access_token genera un token que incluye los datos
 # proporcionados y una fecha de expiración (por defecto, 5 minutos), mientras que verify_token intenta decodificar y validar el token
 # recibido; si es válido, devuelve su contenido, y si no, retorna None, lo que indica que el token es inválido o ha expirado.
+# Los payloads ya verificados se guardan en una caché acotada (indexada por el SHA-256 del token) hasta su "exp", para no repetir
+# la decodificación y la verificación HMAC cada vez que el mismo token bearer llega a una ruta protegida.
+# Con JWT_ALGORITHM=RS256 o ES256 los tokens se firman con la llave activa del llavero (app/utils/jwt_keys.py) e incluyen el "kid"
+# en el encabezado, para que otros servicios puedan verificarlos localmente con el JWKS publicado. Con HS256 se usa el codec
+# especializado de app/utils/jwt_codec.py (llave HMAC preparada una sola vez), compatible con los tokens emitidos por jose.
 
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from app.utils.ttl_cache import TTLCache
+from app.utils.jwt_keys import KeyRing, SUPPORTED_ALGORITHMS
+from app.utils.jwt_codec import HS256Codec
+import hashlib
 import logging
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
 # Clave secreta (reemplázala por algo seguro)
 SECRET_KEY = "mi_clave_secreta_super_segura"
-ALGORITHM = "HS256"
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 5
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")  # Directorio con llaves PEM (si no existe se generan en memoria)
+JWT_KEY_ROTATION_HOURS = float(os.getenv("JWT_KEY_ROTATION_HOURS", "0"))
+
+# Llavero para firma asimétrica; con HS256 se sigue usando SECRET_KEY
+key_ring = None
+if ALGORITHM in SUPPORTED_ALGORITHMS:
+    key_ring = KeyRing(
+        ALGORITHM,
+        verify_overlap_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 60,
+        rotation_seconds=int(JWT_KEY_ROTATION_HOURS * 3600),
+    )
+    if JWT_KEYS_DIR:
+        key_ring.load_from_dir(JWT_KEYS_DIR)
+    else:
+        key_ring.generate()
+
+# Codec HS256 con llave HMAC pre-calculada; el camino genérico de jose queda para los algoritmos asimétricos
+hs256_codec = HS256Codec(SECRET_KEY) if ALGORITHM == "HS256" else None
+
+# Caché de payloads verificados: sha256(token) -> payload, expira en el "exp" del propio token
+verified_token_cache = TTLCache(max_size=TOKEN_CACHE_MAX_SIZE)
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def get_token_cache_stats() -> dict:
+    """Contadores de aciertos/fallos de la caché de tokens verificados"""
+    return verified_token_cache.stats()
+
+def _verification_key(token: str):
+    if key_ring is None:
+        return SECRET_KEY
+    kid = jwt.get_unverified_header(token).get("kid")
+    signing_key = key_ring.get_key(kid)
+    if signing_key is None:
+        raise JWTError(f"kid desconocido: {kid}")
+    return signing_key.public_jwk
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     logger.info("🎫 Creando nuevo JWT token...")
@@ -20,12 +69,18 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
 
     logger.info(f"⏰ Token expirará el: {expire}")
     logger.info(f"⏳ Duración del token: {ACCESS_TOKEN_EXPIRE_MINUTES} minutos")
 
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    if hs256_codec is not None:
+        encoded_jwt = hs256_codec.encode(to_encode)
+    elif key_ring is not None:
+        signing_key = key_ring.active_key()
+        encoded_jwt = jwt.encode(to_encode, signing_key.private_pem, algorithm=ALGORITHM, headers={"kid": signing_key.kid})
+    else:
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
     logger.info(f"✅ JWT creado exitosamente - Length: {len(encoded_jwt)}")
     logger.info(f"🔑 Token preview: {encoded_jwt[:30]}...")
@@ -33,19 +88,32 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 def verify_token(token: str):
+    digest = _token_digest(token)
+    cached = verified_token_cache.get(digest)
+    if cached is not None:
+        logger.debug(f"⚡ JWT servido desde caché - usuario: {cached.get('sub', 'N/A')}")
+        return dict(cached)
+
     logger.info("🔍 Verificando JWT token...")
     logger.info(f"🔑 Token preview: {token[:30]}...")
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if hs256_codec is not None:
+            payload = hs256_codec.decode(token)
+        else:
+            payload = jwt.decode(token, _verification_key(token), algorithms=[ALGORITHM])
         logger.info("✅ JWT válido - token decodificado exitosamente")
         logger.info(f"👤 Usuario del token: {payload.get('sub', 'N/A')}")
         logger.info(f"⏰ Token expira: {datetime.fromtimestamp(payload.get('exp', 0))}")
+
+        # Solo se cachean tokens con "exp": la entrada se desaloja en ese mismo instante
+        if isinstance(payload.get("exp"), (int, float)):
+            verified_token_cache.set(digest, dict(payload), expires_at=payload["exp"])
         return payload
     except jwt.ExpiredSignatureError:
         logger.warning("⏰ JWT expirado - token ya no es válido")
         return None
-    except jwt.InvalidTokenError:
+    except jwt.JWTClaimsError:
         logger.warning("❌ JWT inválido - token malformado o corrupto")
         return None
     except JWTError as e:
@@ -0,0 +1,100 @@
+# Este código define una caché en memoria acotada (TTLCache) donde cada entrada tiene su propio instante de expiración. Las
+# entradas se guardan en un OrderedDict para poder desalojar la menos usada recientemente (LRU) cuando se alcanza el tamaño
+# máximo, y se descartan al leerlas vencidas. Con la caché llena, las vencidas se barren a lo sumo una vez cada purge_interval
+# segundos (el barrido recorre toda la caché); entre barridos se desaloja por LRU. Es segura para usarse desde varios hilos (las
+# rutas síncronas de FastAPI se ejecutan en un threadpool) y lleva contadores de aciertos, fallos, desalojos y expiraciones.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, max_size: int = 1024, default_ttl: float = None, purge_interval: float = 60):
+        """
+        :param max_size: Número máximo de entradas antes de desalojar la menos usada
+        :param default_ttl: Segundos de vida si set() no recibe expires_at (None = sin expiración)
+        :param purge_interval: Segundos mínimos entre barridos de entradas vencidas al llenarse la caché
+        """
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.purge_interval = purge_interval
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at: float = None):
+        """Guarda value bajo key hasta expires_at (epoch en segundos)."""
+        if expires_at is None and self.default_ttl is not None:
+            expires_at = time.time() + self.default_ttl
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (expires_at, value)
+
+            if len(self._data) > self.max_size:
+                now = time.time()
+                if now >= self._next_purge:
+                    self._next_purge = now + self.purge_interval
+                    self._purge_expired(now)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _purge_expired(self, now: float):
+        expired = [k for k, (exp, _) in self._data.items() if exp is not None and exp <= now]
+        for k in expired:
+            del self._data[k]
+        self.expirations += len(expired)
+
+    def purge_expired(self):
+        with self._lock:
+            self._purge_expired(time.time())
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._data)
@@ -10,10 +10,26 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from app.router import keys_router, health_checker_router, user_router
+from app.router import keys_router, health_checker_router, user_router, jwks_router, admin_router
 from app.utils.token import create_access_token
-from app.auth.dependencies import get_current_user
-from ldap3 import Server, Connection, ALL, NTLM
+from app.auth.dependencies import get_current_principal
+from app.auth.principal import Principal
+from app.auth.refresh_tokens import refresh_token_store
+from app.auth.revocation import revocation_list
+from app.auth.msal_validator import msal_validator, MsalValidationError
+from app.utils.http_client import http_client
+from app.utils.graph_profile_cache import graph_profile_cache, REJECTED
+from app.utils.single_flight import msal_flight, directory_flight, flight_key
+from app.utils.ldap_pool import directory_pool, is_account_disabled, first_value, DirectoryPoolTimeout, DirectoryConfigurationError
+from ldap3.core.exceptions import LDAPCommunicationError
+from app.auth.roles import role_resolver
+from app.auth.credential_cache import credential_cache
+from app.utils.directory_authenticator import directory_authenticator, DirectoryUnavailableError
+from app.utils.directory_sync import directory_sync, start_directory_sync
+from app.utils.employee_roster import employee_roster, start_employee_roster
+from app.adapter.db.user_adapter import UserAdapter
+from app.db.tds_pool import tds_pool
+from app.db.session_windows import AsyncSessionLocal, async_db_executor
 import requests
 import json
 
@@ -28,7 +44,22 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application startup")
+    revocation_list.start()
+    msal_validator.start()
+    start_directory_sync()
+    start_employee_roster(fallback=UserAdapter.MOCK_EMPLEADOS)
+    tds_pool.warm()
     yield
+    employee_roster.stop()
+    directory_sync.stop()
+    msal_validator.stop()
+    revocation_list.stop()
+    http_client.close()
+    directory_pool.close()
+    directory_authenticator.close()
+    tds_pool.close()
+    await AsyncSessionLocal.kw["bind"].dispose()
+    async_db_executor.shutdown(wait=False)
     logger.info("Application shutdown")
 
 app = FastAPI(lifespan=lifespan)
@@ -46,9 +77,34 @@ app.add_middleware(
 app.include_router(keys_router.router, prefix="/api/v1/keys")
 app.include_router(user_router.router, prefix="/api/v1/user")
 app.include_router(health_checker_router.router, prefix="/api/v1/health")
+app.include_router(jwks_router.router, prefix="/.well-known")
+app.include_router(admin_router.router, prefix="/api/v1/admin")
 
-# Función para validar token MSAL contra Microsoft Graph
+# Función para validar token MSAL: las validaciones simultáneas del mismo token comparten una sola llamada
 def validate_msal_token(access_token: str):
+    return msal_flight.do(flight_key(access_token), _validate_msal_token, access_token)
+
+# Validación local contra el JWKS del tenant si el token es para esta aplicación, o contra Microsoft Graph
+# si es un token de Graph (no verificable fuera de Microsoft)
+def _validate_msal_token(access_token: str):
+    if msal_validator.is_configured:
+        try:
+            claims = msal_validator.validate(access_token)
+            logger.info(f"✅ Token MSAL validado localmente: {claims.get('preferred_username')}")
+            return {
+                "username": claims.get("preferred_username", ""),
+                "full_name": claims.get("name", ""),
+                "email": claims.get("email", claims.get("preferred_username", "")),
+                "user_id": claims.get("oid", "")
+            }
+        except MsalValidationError as e:
+            logger.info(f"Validación local no aplicable ({e}) - consultando Microsoft Graph")
+
+    cached = graph_profile_cache.get(access_token)
+    if cached is not None:
+        logger.info("⚡ Perfil de Microsoft Graph servido desde caché")
+        return cached if cached is not REJECTED else False
+
     logger.info("🔍 Iniciando validación del token MSAL contra Microsoft Graph")
 
     try:
@@ -60,13 +116,16 @@ def validate_msal_token(access_token: str):
         logger.info("📡 Enviando petición a Microsoft Graph API...")
 
         # Obtener información del usuario desde Microsoft Graph
-        response = requests.get('https://graph.microsoft.com/v1.0/me', headers=headers, timeout=10)
+        response = http_client.get('https://graph.microsoft.com/v1.0/me', headers=headers, deadline=10)
 
         logger.info(f"📨 Respuesta de Microsoft Graph: Status {response.status_code}")
 
         if response.status_code != 200:
             logger.warning(f"❌ Token MSAL inválido: Status {response.status_code}")
             logger.warning(f"Response body: {response.text[:200]}...")
+            # Solo se recuerda el rechazo del token; errores transitorios de Graph (429, 5xx) se reintentan
+            if response.status_code in (401, 403):
+                graph_profile_cache.set_rejected(access_token)
             return False
 
         user_data = response.json()
@@ -81,6 +140,7 @@ def validate_msal_token(access_token: str):
         }
 
         logger.info(f"📋 Datos extraídos para el usuario: {result}")
+        graph_profile_cache.set_profile(access_token, result)
         return result
 
     except requests.exceptions.Timeout:
@@ -94,36 +154,46 @@ def validate_msal_token(access_token: str):
         logger.error(f"Tipo de error: {type(e).__name__}")
         return False
 
-# Función para validar contra Active Directory
+# Función para validar contra Active Directory: las validaciones simultáneas del mismo usuario comparten una sola llamada
 def validate_user_ad(username: str, password: str):
-    ad_server = 'Bancolombia.corp'  # Servidor LDAP
-    ad_base_dn = 'OU=Banistmo,OU=Usuarios,DC=BANCOLOMBIA,DC=CORP'  # DN base correcto
-    user_dn = f"juanv@bancolombia.corp"  # o f"CN={username},{ad_base_dn}" si sabes que CN es el username
-    password = "erh0Bg100632042G"
+    return directory_flight.do(flight_key("main", username.lower(), password), _validate_user_ad, username, password)
 
+# Variante para rutas async: el bind corre en el executor dedicado a AD, con plazo máximo, sin ocupar el threadpool compartido
+async def avalidate_user_ad(username: str, password: str):
+    return await directory_flight.do_async(
+        flight_key("main", username.lower(), password), directory_authenticator.run, _validate_user_ad, username, password
+    )
+
+def _validate_user_ad(username: str, password: str):
     try:
-        server = Server(ad_server, get_info=ALL)
-        conn = Connection(server, user=user_dn, password=password, auto_bind=True)
-        search_filter = f"(&(sAMAccountName={username}))"
-        conn.search(ad_base_dn, search_filter, attributes=['userAccountControl', 'displayName', 'mail'])
-        
-        if not conn.entries:
+        # Bind con las credenciales del usuario sobre una conexión del pool y búsqueda de sus atributos
+        authenticated, entry = credential_cache.authenticate(username, password, role_resolver.attributes)
+        if not authenticated:
+            logger.warning(f"Credenciales inválidas para {username} en AD.")
+            return False
+
+        if not entry:
             logger.warning(f"Usuario {username} no encontrado en AD.")
             return False
-        
-        entry = conn.entries[0]
-        user_account_control = int(entry.userAccountControl.value)
-        if user_account_control & 2:
+
+        if is_account_disabled(entry):
             logger.warning(f"Usuario {username} está deshabilitado en AD.")
             return False
-        
-        logger.info(f"Usuario {username} válido en AD: {entry.displayName.value}, {entry.mail.value}")
+
+        full_name = first_value(entry, "displayName")
+        email = first_value(entry, "mail")
+        logger.info(f"Usuario {username} válido en AD: {full_name}, {email}")
         return {
             "username": username,
-            "full_name": entry.displayName.value,
-            "email": entry.mail.value
+            "full_name": full_name,
+            "email": email,
+            "perfil": role_resolver.perfil(role_resolver.remember(username, entry), "empleado")
         }
-    
+
+    except (LDAPCommunicationError, DirectoryPoolTimeout, DirectoryConfigurationError) as e:
+        # AD caído o sin configurar no es "credenciales inválidas": la ruta responde 503
+        logger.error(f"Active Directory no disponible al validar a {username}: {e}")
+        raise DirectoryUnavailableError(str(e)) from e
     except Exception as e:
         logger.error(f"Error al validar usuario {username} contra AD: {e}")
         return False
@@ -138,17 +208,18 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         "email": "usuario@dominio.com",
         "full_name": "Juan Pérez"
     }
+    refresh_token, user_data = refresh_token_store.open_session(user_data)
     token = create_access_token(user_data)
-    return {"access_token": token, "expires": "bearer", "status": "bearer", "token_type": "bearer"}
+    return {"access_token": token, "refresh_token": refresh_token, "expires": "bearer", "status": "bearer", "token_type": "bearer"}
 
 # Ruta protegida de ejemplo
 @app.get("/api/v1/protected")
-def protected_route(current_user: dict = Depends(get_current_user)):
-    return {"message": f"Hola, {current_user['sub']}! Tienes acceso al recurso protegido."}
+def protected_route(principal: Principal = Depends(get_current_principal)):
+    return {"message": f"Hola, {principal.username}! Tienes acceso al recurso protegido."}
 
 # Ruta para validar con MSAL o Active Directory
 @app.post("/msal")
-def login_msal(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_msal(form_data: OAuth2PasswordRequestForm = Depends()):
     logger.info("=== NUEVA PETICIÓN AL ENDPOINT /msal ===")
     logger.info(f"Username recibido: {form_data.username}")
     logger.info(f"Password length: {len(form_data.password) if form_data.password else 0}")
@@ -159,41 +230,51 @@ def login_msal(form_data: OAuth2PasswordRequestForm = Depends()):
         logger.info("🔑 Detectado token MSAL - iniciando validación")
         logger.info(f"Token preview: {access_token[:50]}..." if len(access_token) > 50 else f"Token: {access_token}")
 
-        user_info = validate_msal_token(access_token)
+        user_info = await msal_flight.do_async(flight_key(access_token), _validate_msal_token, access_token)
         if not user_info:
             logger.error("❌ Token MSAL inválido - rechazando petición")
             raise HTTPException(status_code=401, detail="Token MSAL inválido o expirado.")
 
         logger.info("✅ Token MSAL válido - creando JWT interno")
+        try:
+            roles = await directory_authenticator.run(role_resolver.resolve_by_mail, user_info["email"])
+        except DirectoryUnavailableError:
+            roles = None
         user_data = {
             "sub": user_info["username"],
-            "perfil": "empleado",  # Puedes personalizar según el rol real
+            "perfil": role_resolver.perfil(roles, "empleado"),
             "email": user_info["email"],
             "full_name": user_info["full_name"],
             "user_id": user_info["user_id"]
         }
         logger.info(f"User data para JWT: {user_data}")
 
+        refresh_token, user_data = refresh_token_store.open_session(user_data)
         token = create_access_token(user_data)
         logger.info(f"🎫 JWT creado exitosamente - expira en 5 minutos")
         logger.info(f"JWT preview: {token[:50]}...")
-        return {"access_token": token, "token_type": "bearer"}
+        return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
     # Fallback a validación LDAP tradicional
     else:
         username = form_data.username
         password = form_data.password
 
-        user_info = validate_user_ad(username, password)
+        try:
+            user_info = await avalidate_user_ad(username, password)
+        except DirectoryUnavailableError as e:
+            logger.error(f"🚫 Active Directory no disponible: {e}")
+            raise HTTPException(status_code=503, detail="Directorio activo no disponible, intente nuevamente.")
         if not user_info:
             raise HTTPException(status_code=401, detail="Credenciales inválidas o usuario no válido en Active Directory.")
 
         user_data = {
             "sub": username,
-            "perfil": "empleado",  # Puedes personalizar según el rol real
+            "perfil": user_info["perfil"],
             "email": user_info["email"],
             "full_name": user_info["full_name"]
         }
 
+        refresh_token, user_data = refresh_token_store.open_session(user_data)
         token = create_access_token(user_data)
-        return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
+        return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
\ No newline at end of file
@@ -0,0 +1,155 @@
+# Pruebas de la sincronización del directorio (DirectorySync) contra la estrategia MOCK_SYNC de ldap3: carga completa,
+# sincronización incremental por uSNChanged, conciliación que quita las cuentas eliminadas, recarga completa cuando responde otro
+# controlador y respaldo en AD para los usuarios que todavía no están en el índice local.
+
+from contextlib import contextmanager
+import pytest
+from ldap3 import Server, Connection, MOCK_SYNC, OFFLINE_AD_2012_R2
+from app.utils.directory_sync import DirectorySync
+
+BASE_DN = "OU=Banistmo,OU=Usuarios,DC=bancolombia,DC=corp"
+
+
+class MockDirectory:
+    """Directorio en memoria con uno o varios controladores; cada uno es una conexión MOCK_SYNC con las mismas entradas"""
+
+    def __init__(self, hosts=("dc1",)):
+        self.connections = {}
+        for host in hosts:
+            conn = Connection(Server(host, get_info=OFFLINE_AD_2012_R2), client_strategy=MOCK_SYNC)
+            conn.bind()
+            self.connections[host] = conn
+        self.active_host = hosts[0]
+        self.requested_hosts = []
+
+    def add_user(self, username: str, usn: int, disabled: bool = False, mail: str = None):
+        for conn in self.connections.values():
+            conn.strategy.add_entry(f"CN={username},{BASE_DN}", {
+                "objectClass": ["top", "person", "user"],
+                "sAMAccountName": username,
+                "displayName": username.title(),
+                "mail": mail or f"{username}@banistmo.com",
+                "userAccountControl": 514 if disabled else 512,
+                "uSNChanged": usn,
+            })
+
+    def update_user(self, username: str, usn: int, disabled: bool):
+        for conn in self.connections.values():
+            conn.strategy.remove_entry(f"CN={username},{BASE_DN}")
+        self.add_user(username, usn, disabled)
+
+    def delete_user(self, username: str):
+        for conn in self.connections.values():
+            conn.strategy.remove_entry(f"CN={username},{BASE_DN}")
+
+    @contextmanager
+    def connection(self, prefer_host: str = None):
+        self.requested_hosts.append(prefer_host)
+        yield self.connections[self.active_host]
+
+
+@pytest.fixture
+def directory():
+    mock = MockDirectory(hosts=("dc1", "dc2"))
+    mock.add_user("lreyes", usn=10)
+    mock.add_user("mrodriguez", usn=11, disabled=True)
+    return mock
+
+
+def test_full_sync_indexes_users(directory):
+    sync = DirectorySync(connection_factory=directory.connection, base_dn=BASE_DN)
+    assert not sync.ready
+
+    assert sync.full_sync() == 2
+    assert sync.ready
+    assert sync.source_host == "dc1"
+    assert sync.lookup("LREYES").enabled
+    assert not sync.lookup("mrodriguez").enabled
+    assert sync.lookup_mail("lreyes@banistmo.com").username == "lreyes"
+    assert sync.lookup("desconocido") is None
+
+
+def test_incremental_sync_only_applies_changes(directory):
+    sync = DirectorySync(connection_factory=directory.connection, base_dn=BASE_DN)
+    sync.full_sync()
+
+    directory.add_user("jmendez", usn=12)
+    directory.update_user("lreyes", usn=13, disabled=True)
+
+    assert sync.incremental_sync() == 2
+    assert sync.full_syncs == 1
+    assert sync.lookup("jmendez").enabled
+    assert not sync.lookup("lreyes").enabled
+    assert sync.stats()["highest_usn"] == 13
+    assert sync.incremental_sync() == 0
+
+
+def test_reconcile_removes_deleted_users(directory):
+    sync = DirectorySync(connection_factory=directory.connection, base_dn=BASE_DN, reconcile_interval_seconds=1)
+    sync.full_sync()
+
+    # Una cuenta eliminada no aparece en la búsqueda por uSNChanged: sigue en el índice hasta la conciliación
+    directory.delete_user("lreyes")
+    assert sync.incremental_sync() == 0
+    assert sync.lookup("lreyes") is not None
+
+    sync.last_reconcile = 0.0
+    sync.sync()
+    assert sync.lookup("lreyes") is None
+    assert sync.lookup_mail("lreyes@banistmo.com") is None
+    assert sync.lookup("mrodriguez") is not None
+    assert sync.stats()["removed"] == 1
+    assert sync.full_syncs == 1
+
+
+def test_sync_stays_on_source_controller(directory):
+    sync = DirectorySync(connection_factory=directory.connection, base_dn=BASE_DN)
+    sync.full_sync()
+    sync.incremental_sync()
+    assert directory.requested_hosts == [None, "dc1"]
+
+    # El controlador fijado falló y respondió otro: sus uSNChanged no son comparables
+    directory.active_host = "dc2"
+    sync.incremental_sync()
+    assert sync.full_syncs == 2
+    assert sync.source_host == "dc2"
+
+
+def test_index_miss_falls_back_to_directory(directory, monkeypatch):
+    pytest.importorskip("pyodbc", exc_type=ImportError)  # UserAdapter crea el engine de SQL Server (requiere libodbc)
+    from app.adapter.db import user_adapter
+
+    sync = DirectorySync(connection_factory=directory.connection, base_dn=BASE_DN)
+    sync.full_sync()
+    searched = []
+
+    def search_users(usernames):
+        searched.extend(usernames)
+        return {"nuevo": {"userAccountControl": 512}}
+
+    monkeypatch.setattr(user_adapter, "directory_sync", sync)
+    monkeypatch.setattr(user_adapter.directory_pool, "search_users", search_users)
+
+    adapter = user_adapter.UserAdapter.__new__(user_adapter.UserAdapter)
+    result = adapter.validate_users_active_directory(["lreyes", "nuevo", "inexistente"])
+    assert searched == ["nuevo", "inexistente"]
+    assert result["lreyes"] == {"exists": True, "enabled": True}
+    assert result["nuevo"] == {"exists": True, "enabled": True}
+    assert result["inexistente"] == {"exists": False, "enabled": False}
+
+
+def test_directory_outage_is_not_reported_as_missing(monkeypatch):
+    pytest.importorskip("pyodbc", exc_type=ImportError)  # UserAdapter crea el engine de SQL Server (requiere libodbc)
+    from ldap3.core.exceptions import LDAPCommunicationError
+    from app.adapter.db import user_adapter
+    from app.utils.directory_authenticator import DirectoryUnavailableError
+
+    def search_users(usernames):
+        raise LDAPCommunicationError("sin controladores disponibles")
+
+    monkeypatch.setattr(user_adapter, "directory_sync", DirectorySync(connection_factory=None, base_dn=BASE_DN))
+    monkeypatch.setattr(user_adapter.directory_pool, "search_users", search_users)
+
+    adapter = user_adapter.UserAdapter.__new__(user_adapter.UserAdapter)
+    with pytest.raises(DirectoryUnavailableError):
+        adapter.validate_users_active_directory(["lreyes"])
@@ -0,0 +1,68 @@
+# Pruebas de SingleFlight con rutas async: la cancelación de un seguidor no afecta al líder ni a los demás seguidores, y la
+# cancelación del líder hace que los seguidores reintenten en lugar de recibir un CancelledError ajeno.
+
+import asyncio
+import pytest
+from app.utils.single_flight import SingleFlight
+
+
+def test_cancelled_follower_does_not_affect_others():
+    flight = SingleFlight("test-follower")
+
+    async def scenario():
+        release = asyncio.Event()
+        executions = []
+
+        async def validate():
+            executions.append(1)
+            await release.wait()
+            return "ok"
+
+        leader = asyncio.create_task(flight.do_async("key", validate))
+        await asyncio.sleep(0)
+        follower_1 = asyncio.create_task(flight.do_async("key", validate))
+        follower_2 = asyncio.create_task(flight.do_async("key", validate))
+        await asyncio.sleep(0)
+
+        follower_1.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await follower_1
+        assert await leader == "ok"
+        assert await follower_2 == "ok"
+        assert len(executions) == 1
+
+    asyncio.run(scenario())
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_lets_follower_retry():
+    flight = SingleFlight("test-leader")
+
+    async def scenario():
+        release = asyncio.Event()
+        executions = []
+
+        async def validate():
+            executions.append(1)
+            await release.wait()
+            return "ok"
+
+        leader = asyncio.create_task(flight.do_async("key", validate))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do_async("key", validate))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == "ok"
+        assert len(executions) == 2
+
+    asyncio.run(scenario())
+    assert flight.stats()["in_flight"] == 0